@@ -0,0 +1,41 @@
+"""Throughput of concurrent run_query calls against one postgre-mcp process.
+
+Sends the same batch of slow queries (SELECT pg_sleep) through FastMCP
+twice: once with run_query registered as a plain sync tool, which runs on
+the event loop one call at a time, and once through the worker-pool
+handler that main.py registers.
+
+    PG_HOST=... PG_DB=... python benchmarks/bench_concurrency.py [calls] [sleep_seconds]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "postgre-mcp"))
+from mcp.server.fastmcp import FastMCP  # noqa: E402
+import main  # noqa: E402
+
+CALLS = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+SLEEP = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+
+
+async def run(name, server):
+    arguments = {"args": {"query": f"SELECT pg_sleep({SLEEP})", "cache": False}}
+    start = time.perf_counter()
+    await asyncio.gather(*(server.call_tool("run_query", arguments) for _ in range(CALLS)))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {CALLS} calls in {elapsed:6.2f}s  {CALLS / elapsed:8.1f} calls/s")
+    return elapsed
+
+
+async def bench():
+    blocking = FastMCP("baseline")
+    blocking.tool("run_query")(main.run_query)
+    sync_time = await run("sync", blocking)
+    async_time = await run("worker pool", main.mcp)
+    print(f"speedup      {sync_time / async_time:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(bench())
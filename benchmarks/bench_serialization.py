@@ -0,0 +1,79 @@
+"""Bytes and milliseconds to serialize 100k driver rows.
+
+Compares the old pandas paths (DataFrame.to_string in postgre-mcp,
+to_dict(orient="records") in mssql-mcp) with the columnar and Arrow
+payloads from serialization.py.
+
+    python benchmarks/bench_serialization.py [rows]
+"""
+import datetime
+import decimal
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared"))
+from serialization import to_payload  # noqa: E402
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+COLUMNS = ["invoice", "customer_id", "stockcode", "quantity", "unitprice", "invoicedate"]
+
+
+def make_rows(n):
+    start = datetime.datetime(2010, 12, 1, 8, 26)
+    return [
+        (
+            str(536365 + i // 4),
+            12000 + i % 4000,
+            f"SC{i % 3000}",
+            i % 12 + 1,
+            decimal.Decimal(f"{(i % 1000) / 100:.2f}"),
+            start + datetime.timedelta(minutes=i),
+        )
+        for i in range(n)
+    ]
+
+
+def run(name, fn, rows):
+    start = time.perf_counter()
+    payload = fn(rows)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{name:<28} {elapsed:>10.1f} ms {len(payload):>14,} bytes")
+
+
+def pandas_to_string(rows):
+    import pandas as pd
+    return pd.DataFrame(rows, columns=COLUMNS).to_string(index=False).encode()
+
+
+def pandas_records(rows):
+    import pandas as pd
+    records = pd.DataFrame(rows, columns=COLUMNS).to_dict(orient="records")
+    return json.dumps(records, default=str).encode()
+
+
+def columnar(rows):
+    return json.dumps(to_payload(COLUMNS, rows), separators=(",", ":")).encode()
+
+
+def arrow(rows):
+    return json.dumps(to_payload(COLUMNS, rows, "arrow")).encode()
+
+
+if __name__ == "__main__":
+    rows = make_rows(ROWS)
+    print(f"{ROWS:,} rows")
+    benchmarks = [("columnar json", columnar)]
+    try:
+        import pandas  # noqa: F401
+        benchmarks = [("pandas to_string", pandas_to_string), ("pandas records json", pandas_records)] + benchmarks
+    except ImportError:
+        print("pandas not installed, skipping pandas baselines")
+    try:
+        import pyarrow  # noqa: F401
+        benchmarks.append(("arrow ipc (base64)", arrow))
+    except ImportError:
+        print("pyarrow not installed, skipping arrow")
+    for name, fn in benchmarks:
+        run(name, fn, rows)
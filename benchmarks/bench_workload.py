@@ -0,0 +1,334 @@
+"""Mixed-workload throughput and latency against one or more MCP servers.
+
+For each server this generates the synthetic retail dataset at the chosen
+scale (retail_data.py), loads it with the server's own loader, then replays
+a fixed, seeded mix of tool calls (reads, previews, metadata and writes)
+through FastMCP with N calls in flight, and reports calls/s with p50/p99
+latency per tool and overall.
+
+    python benchmarks/bench_workload.py --server postgres mongo --rows 10000 --calls 2000
+
+Databases:
+  postgres  PG_HOST/PG_PORT/PG_DB/PG_USER/PG_PASSWORD, or --spawn-postgres to
+            start a throwaway server under the work directory (needs pgserver)
+  mongo     MONGO_URI/DB_NAME, or an in-process mongomock store when
+            MONGO_URI is unset (fine for the 10k scale, slow beyond it)
+  mssql     SQL_SERVER/SQL_DATABASE/SQL_USERNAME/SQL_PASSWORD
+
+Tables are created when missing; rows the workload writes are removed
+afterwards. Pass --skip-load to replay against data that is already loaded.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+
+import retail_data
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SERVERS = {
+    "postgres": ("postgre-mcp", "loader.py", "main"),
+    "mongo": ("mongo-mcp", "load_data.py", "mongo_db_mcp"),
+    "mssql": ("mssql-mcp", "loader.py", "main"),
+}
+# Keys of rows written by the workload start here, clear of generated customers
+WRITE_KEY_BASE = 900_000_000
+
+PG_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS products (code TEXT PRIMARY KEY, name TEXT, price NUMERIC)",
+    "CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY, country TEXT)",
+    "CREATE TABLE IF NOT EXISTS orders (invoice TEXT PRIMARY KEY, customer_id INTEGER, items JSONB, total NUMERIC)",
+]
+MSSQL_SCHEMA = [
+    "IF OBJECT_ID('products') IS NULL CREATE TABLE products "
+    "(code NVARCHAR(32) PRIMARY KEY, name NVARCHAR(255), price DECIMAL(10, 2))",
+    "IF OBJECT_ID('users') IS NULL CREATE TABLE users (user_id INT PRIMARY KEY, country NVARCHAR(64))",
+    "IF OBJECT_ID('orders') IS NULL CREATE TABLE orders "
+    "(invoice NVARCHAR(32) PRIMARY KEY, customer_id INT, items NVARCHAR(MAX), total DECIMAL(18, 2))",
+]
+
+
+def postgres_workload(rng, customers, keys):
+    """(weight, tool, arguments factory) entries for postgre-mcp."""
+    def customer():
+        return rng.choice(customers)
+    return [
+        (25, "run_query", lambda: {
+            "query": "SELECT customer_id, count(*) AS orders, sum(total) AS spent FROM orders "
+                     "WHERE customer_id = %s GROUP BY customer_id",
+            "params": [customer()]}),
+        (10, "run_query", lambda: {
+            "query": "SELECT invoice, total FROM orders WHERE total > %s ORDER BY total DESC LIMIT 20",
+            "params": [rng.randint(100, 2000)]}),
+        (20, "preview_table", lambda: {"table_name": rng.choice(["products", "users", "orders"]), "limit": 50}),
+        (5, "list_tables", lambda: {}),
+        (5, "get_table_schema", lambda: {"table_name": rng.choice(["products", "users", "orders"])}),
+        (5, "get_database_metadata", lambda: {}),
+        (5, "table_stats", lambda: {"table_name": rng.choice(["products", "users", "orders"])}),
+        (5, "insert_row", lambda: {"table_name": "users", "row_data": {"user_id": next(keys), "country": "Bench"}}),
+        (5, "update_row", lambda: {"table_name": "users", "update_data": {"country": "Bench"},
+                                   "where": f"user_id = {rng.randrange(WRITE_KEY_BASE, WRITE_KEY_BASE + 1000)}"}),
+        (5, "delete_row", lambda: {"table_name": "users",
+                                   "where": f"user_id = {rng.randrange(WRITE_KEY_BASE, WRITE_KEY_BASE + 1000)}"}),
+    ]
+
+
+def mssql_workload(rng, customers, keys):
+    return [
+        (25, "run_query", lambda: {
+            "query": "SELECT customer_id, COUNT(*) AS orders, SUM(total) AS spent FROM orders "
+                     f"WHERE customer_id = {rng.choice(customers)} GROUP BY customer_id"}),
+        (10, "run_query", lambda: {
+            "query": f"SELECT TOP 20 invoice, total FROM orders WHERE total > {rng.randint(100, 2000)} "
+                     "ORDER BY total DESC"}),
+        (20, "preview_table", lambda: {"table_name": rng.choice(["products", "users", "orders"]), "limit": 50}),
+        (5, "list_tables", lambda: {}),
+        (5, "get_table_schema", lambda: {"table_name": rng.choice(["products", "users", "orders"])}),
+        (10, "database_metadata", lambda: {}),
+        (5, "insert_row", lambda: {"table": "users", "data": {"user_id": next(keys), "country": "Bench"}}),
+        (5, "update_row", lambda: {"table": "users", "key_column": "user_id", "updates": {"country": "Bench"},
+                                   "key_value": rng.randrange(WRITE_KEY_BASE, WRITE_KEY_BASE + 1000)}),
+        (5, "delete_row", lambda: {"table": "users", "key_column": "user_id",
+                                   "key_value": rng.randrange(WRITE_KEY_BASE, WRITE_KEY_BASE + 1000)}),
+    ]
+
+
+def mongo_workload(rng, customers, keys):
+    return [
+        (25, "find", lambda: {"collection": "orders", "filter": {"customer_id": rng.choice(customers)},
+                              "projection": {"_id": 0, "items": 0}, "limit": 20}),
+        (10, "aggregate", lambda: {"collection": "orders", "pipeline": [
+            {"$match": {"customer_id": rng.choice(customers)}},
+            {"$group": {"_id": "$customer_id", "orders": {"$sum": 1}, "spent": {"$sum": "$total"}}}]}),
+        (20, "find", lambda: {"collection": rng.choice(["products", "users", "orders"]), "limit": 50}),
+        (5, "listCollections", lambda: {}),
+        (5, "estimatedDocumentCount", lambda: {"collection": rng.choice(["products", "users", "orders"])}),
+        (5, "indexes", lambda: {"collection": rng.choice(["products", "users", "orders"])}),
+        (5, "count", lambda: {"collection": "orders", "filter": {"customer_id": rng.choice(customers)}}),
+        (5, "insertOne", lambda: {"collection": "users", "document": {"user_id": next(keys), "Country": "Bench"}}),
+        (5, "updateOne", lambda: {"collection": "users", "update": {"Country": "Bench"},
+                                  "filter": {"user_id": rng.randrange(WRITE_KEY_BASE, WRITE_KEY_BASE + 1000)}}),
+        (5, "deleteOne", lambda: {"collection": "users",
+                                  "filter": {"user_id": rng.randrange(WRITE_KEY_BASE, WRITE_KEY_BASE + 1000)}}),
+    ]
+
+
+WORKLOADS = {"postgres": postgres_workload, "mongo": mongo_workload, "mssql": mssql_workload}
+
+
+def prepare_data(workdir: str, rows: int, seed: int) -> str:
+    """Directory holding data.csv for this scale, generating it once."""
+    directory = os.path.join(workdir, f"retail-{rows}-{seed}")
+    path = os.path.join(directory, "data.csv")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        start = time.perf_counter()
+        retail_data.generate(path, rows, seed)
+        print(f"generated    {rows} rows in {time.perf_counter() - start:.2f}s")
+    return directory
+
+
+def spawn_postgres(workdir: str):
+    import pgserver  # only needed for --spawn-postgres
+    server = pgserver.get_server(os.path.join(workdir, "pgdata"))
+    os.environ.update(PG_HOST=str(server.pgdata), PG_USER="postgres", PG_DB="postgres", PG_PASSWORD="")
+    return server
+
+
+def use_mongomock():
+    """Point every MongoClient, including the loader's, at one in-process store."""
+    import mongomock
+    import pymongo
+    client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: client
+    os.environ.setdefault("DB_NAME", "retail_bench")
+    os.environ["LOAD_WORKERS"] = "1"
+
+
+def create_tables(server: str):
+    if server == "postgres":
+        from common import pool
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                for statement in PG_SCHEMA:
+                    cur.execute(statement)
+            conn.commit()
+        finally:
+            pool.putconn(conn)
+    elif server == "mssql":
+        from common import get_conn
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            for statement in MSSQL_SCHEMA:
+                cursor.execute(statement)
+            conn.commit()
+
+
+def remove_written_rows(server: str, module):
+    if server == "postgres":
+        module.delete_row({"table_name": "users", "where": f"user_id >= {WRITE_KEY_BASE}"})
+    elif server == "mssql":
+        from common import get_conn
+        with get_conn() as conn:
+            conn.cursor().execute(f"DELETE FROM users WHERE user_id >= {WRITE_KEY_BASE}")
+            conn.commit()
+    else:
+        module.db["users"].delete_many({"user_id": {"$gte": WRITE_KEY_BASE}})
+
+
+def load(loader: str, data_dir: str):
+    """Run the server's loader script on data_dir/data.csv."""
+    cwd = os.getcwd()
+    os.chdir(data_dir)
+    start = time.perf_counter()
+    try:
+        runpy.run_path(loader, run_name="__main__")
+    finally:
+        os.chdir(cwd)
+    return time.perf_counter() - start
+
+
+def percentile(latencies: list, q: float) -> float:
+    """Nearest-rank percentile of sorted latencies, in milliseconds."""
+    if not latencies:
+        return 0.0
+    return 1000 * latencies[min(len(latencies) - 1, max(0, round(q * len(latencies)) - 1))]
+
+
+async def replay(mcp, calls: list, concurrency: int):
+    """Run (tool, arguments) calls with at most `concurrency` in flight."""
+    tools = {tool.name: tool for tool in await mcp.list_tools()}
+    latencies = {}
+    failures = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(name, arguments):
+        # Tools take one dict argument, named "args" or "data" depending on the tool
+        parameter = next(iter(tools[name].inputSchema["properties"]))
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await mcp.call_tool(name, {parameter: arguments})
+            except Exception:
+                failures[name] = failures.get(name, 0) + 1
+            latencies.setdefault(name, []).append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(name, arguments) for name, arguments in calls))
+    return time.perf_counter() - start, latencies, failures
+
+
+def report(server: str, elapsed: float, latencies: dict, failures: dict, recorded: dict) -> dict:
+    """Print the per-tool table and return the same numbers as a dict."""
+    every = sorted(seconds for values in latencies.values() for seconds in values)
+    result = {
+        "server": server,
+        "calls": len(every),
+        "seconds": round(elapsed, 3),
+        "calls_per_second": round(len(every) / elapsed, 1),
+        "p50_ms": round(percentile(every, 0.5), 2),
+        "p99_ms": round(percentile(every, 0.99), 2),
+        "tools": {},
+    }
+    print(f"{'tool':<24}{'calls':>7}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}{'rows':>10}{'bytes':>12}")
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        stats = recorded.get(name, {})
+        tool = {
+            "calls": len(values),
+            # Calls that reach the tool are counted by metrics, failed or not; the rest only here
+            "errors": stats["errors"] if stats else failures.get(name, 0),
+            "p50_ms": round(percentile(values, 0.5), 2),
+            "p99_ms": round(percentile(values, 0.99), 2),
+            "rows": stats.get("rows", 0),
+            "bytes": stats.get("bytes", 0),
+        }
+        result["tools"][name] = tool
+        print(f"{name:<24}{tool['calls']:>7}{tool['errors']:>8}{tool['p50_ms']:>10.2f}{tool['p99_ms']:>10.2f}"
+              f"{tool['rows']:>10}{tool['bytes']:>12}")
+    print(f"{'total':<24}{result['calls']:>7}{'':>8}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+    print(f"throughput   {result['calls']} calls in {elapsed:.2f}s  {result['calls_per_second']:.1f} calls/s")
+    return result
+
+
+def bench(server: str, options) -> dict:
+    directory, loader, module_name = SERVERS[server]
+    sys.path.insert(0, os.path.join(ROOT, directory))
+    workdir = os.path.abspath(options.workdir)
+    os.makedirs(workdir, exist_ok=True)
+    if server == "postgres" and options.spawn_postgres:
+        spawn_postgres(workdir)
+    in_process = server == "mongo" and not os.getenv("MONGO_URI")
+    if in_process:
+        use_mongomock()
+
+    data_dir = prepare_data(workdir, options.rows, options.seed)
+    module = __import__(module_name)
+    import metrics
+    create_tables(server)
+    if not options.skip_load or in_process:   # a mongomock store starts empty every run
+        print(f"loaded       {server} in {load(os.path.join(ROOT, directory, loader), data_dir):.2f}s")
+
+    rng = random.Random(options.seed)
+    keys = itertools.count(WRITE_KEY_BASE)
+    entries = WORKLOADS[server](rng, list(retail_data.customer_ids(options.rows)), keys)
+    weights = [weight for weight, _, _ in entries]
+    chosen = rng.choices(entries, weights=weights, k=options.calls)
+    calls = [(name, make()) for _, name, make in chosen]
+
+    print(f"replaying    {options.calls} calls, {options.concurrency} in flight")
+    try:
+        elapsed, latencies, failures = asyncio.run(replay(module.mcp, calls, options.concurrency))
+    finally:
+        remove_written_rows(server, module)
+    return report(server, elapsed, latencies, failures, metrics.snapshot())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", nargs="+", choices=sorted(SERVERS), default=["postgres"])
+    parser.add_argument("--rows", type=int, default=10_000, help="invoice lines to generate (10000, 1000000, ...)")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "mcp-retail-bench"),
+                        help="generated data.csv files and the --spawn-postgres data directory")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--spawn-postgres", action="store_true")
+    parser.add_argument("--json", help="also write the results to this file")
+    options = parser.parse_args()
+
+    if len(options.server) > 1:
+        # Every server has its own main/common/executor modules, so each runs in its own process
+        results = []
+        for server in options.server:
+            argv = [__file__, "--server", server, "--rows", str(options.rows), "--calls", str(options.calls),
+                    "--concurrency", str(options.concurrency), "--seed", str(options.seed),
+                    "--workdir", options.workdir]
+            argv += ["--skip-load"] * options.skip_load + ["--spawn-postgres"] * options.spawn_postgres
+            if options.json:
+                argv += ["--json", f"{options.json}.{server}"]
+            print(f"== {server}", flush=True)
+            subprocess.run([sys.executable] + argv, check=True)
+            if options.json:
+                with open(f"{options.json}.{server}") as f:
+                    results.extend(json.load(f))
+                os.remove(f"{options.json}.{server}")
+    else:
+        results = [bench(options.server[0], options)]
+
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
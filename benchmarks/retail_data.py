@@ -0,0 +1,89 @@
+"""Synthetic retail dataset in the shape of the loaders' data.csv.
+
+Writes invoice lines with the Online Retail columns (InvoiceNo, StockCode,
+Description, Quantity, InvoiceDate, UnitPrice, CustomerID, Country), so
+every loader turns them into the same products, users and orders it builds
+from the real file. Output is deterministic for a given row count and seed.
+
+    python benchmarks/retail_data.py [rows] [path] [seed]
+"""
+import csv
+import datetime
+import os
+import random
+import sys
+
+HEADER = ["InvoiceNo", "StockCode", "Description", "Quantity", "InvoiceDate", "UnitPrice", "CustomerID", "Country"]
+COUNTRIES = ["United Kingdom"] * 8 + ["Germany", "France", "EIRE", "Spain", "Netherlands", "Belgium",
+                                      "Switzerland", "Portugal", "Australia", "Norway"]
+ADJECTIVES = ["WHITE", "RED", "VINTAGE", "PINK", "BLUE", "JUMBO", "SET OF 3", "HEART", "GLASS", "PAPER"]
+NOUNS = ["LANTERN", "MUG", "BAG", "CANDLE", "CLOCK", "DOORMAT", "BUNTING", "TEA SET", "NOTEBOOK", "CUSHION"]
+QUANTITIES = [1, 1, 2, 2, 3, 4, 6, 6, 12, 12, 24, 48]
+
+FIRST_INVOICE = 536365
+FIRST_CUSTOMER = 12346
+START = datetime.datetime(2010, 12, 1, 8, 26)
+# One invoice in this many has no CustomerID, which the loaders drop
+ANONYMOUS_EVERY = 200
+
+
+def scale(rows: int) -> dict:
+    """Distinct products, customers and the average lines per invoice for a row count."""
+    return {
+        "products": min(max(rows // 100, 100), 100_000),
+        "customers": min(max(rows // 50, 50), 1_000_000),
+        "lines_per_invoice": 20,
+    }
+
+
+def customer_ids(rows: int) -> range:
+    return range(FIRST_CUSTOMER, FIRST_CUSTOMER + scale(rows)["customers"])
+
+
+def _products(count: int, rng: random.Random) -> list:
+    products = []
+    for i in range(count):
+        code = f"{20000 + i}" if i % 7 else f"{20000 + i}A"
+        name = f"{ADJECTIVES[i % len(ADJECTIVES)]} {NOUNS[i // len(ADJECTIVES) % len(NOUNS)]} {i}"
+        products.append((code, name, f"{rng.uniform(0.19, 15.0):.2f}"))
+    return products
+
+
+def generate(path: str, rows: int, seed: int = 0) -> str:
+    """Write `rows` invoice lines to path and return it."""
+    rng = random.Random(seed)
+    sizes = scale(rows)
+    products = _products(sizes["products"], rng)
+    countries = [rng.choice(COUNTRIES) for _ in range(sizes["customers"])]
+    max_lines = 2 * sizes["lines_per_invoice"] - 1
+
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="", encoding="ISO-8859-1") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        written = 0
+        invoice = FIRST_INVOICE
+        when = START
+        while written < rows:
+            customer = rng.randrange(sizes["customers"])
+            anonymous = invoice % ANONYMOUS_EVERY == 0
+            customer_id = "" if anonymous else f"{FIRST_CUSTOMER + customer}.0"
+            country = countries[customer]
+            date = f"{when.month}/{when.day}/{when.year} {when.hour}:{when.minute:02d}"
+            lines = min(rng.randint(1, max_lines), rows - written)
+            writer.writerows(
+                (invoice, code, name, rng.choice(QUANTITIES), date, price, customer_id, country)
+                for code, name, price in rng.sample(products, min(lines, len(products)))
+            )
+            written += min(lines, len(products))
+            invoice += 1
+            when += datetime.timedelta(minutes=rng.randint(1, 30))
+    os.replace(tmp, path)   # an interrupted run never leaves a short file behind
+    return path
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    path = sys.argv[2] if len(sys.argv) > 2 else "data.csv"
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    print(f"Wrote {rows} rows to {generate(path, rows, seed)}")
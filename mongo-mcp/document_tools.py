@@ -1,8 +1,93 @@
 # document_tools.py
+import os
+from pymongo import InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from executor import blocking_tool
+
+# Operations sent per bulk_write call, and error details kept per request
+WRITE_CHUNK_SIZE = int(os.getenv("WRITE_CHUNK_SIZE", "1000"))
+MAX_REPORTED_ERRORS = int(os.getenv("MAX_REPORTED_ERRORS", "100"))
+
+
+def _as_update(update: dict) -> dict:
+    # Plain field/value documents keep the updateOne tool's $set behaviour
+    if update and not any(key.startswith("$") for key in update):
+        return {"$set": update}
+    return update
+
+
+def _to_operation(op: dict):
+    """Build a pymongo request from a shell-style {"updateOne": {...}} entry."""
+    if not isinstance(op, dict) or len(op) != 1:
+        raise ValueError("each operation must be an object with a single key")
+    kind, spec = next(iter(op.items()))
+    if kind == "insertOne":
+        return InsertOne(spec["document"])
+    if kind == "updateOne":
+        return UpdateOne(spec["filter"], _as_update(spec["update"]), upsert=spec.get("upsert", False))
+    if kind == "updateMany":
+        return UpdateMany(spec["filter"], _as_update(spec["update"]), upsert=spec.get("upsert", False))
+    if kind == "replaceOne":
+        return ReplaceOne(spec["filter"], spec["replacement"], upsert=spec.get("upsert", False))
+    if kind == "deleteOne":
+        return DeleteOne(spec["filter"])
+    if kind == "deleteMany":
+        return DeleteMany(spec["filter"])
+    raise ValueError(f"unsupported operation '{kind}'")
+
+
+def bulk_write(collection, operations: list, write_concern: dict = None, ordered: bool = False) -> dict:
+    """Run operations as bulk writes in WRITE_CHUNK_SIZE chunks.
+
+    Unordered chunks keep going past failed operations; their errors are
+    reported with the index of the operation in the original list. Write
+    concern errors are not tied to one operation, so they carry the index
+    of the first operation of their chunk.
+    """
+    if write_concern:
+        collection = collection.with_options(write_concern=WriteConcern(**write_concern))
+
+    totals = {"inserted": 0, "matched": 0, "modified": 0, "upserted": 0, "deleted": 0}
+    errors = []
+    error_count = 0
+    concern_errors = []
+    concern_error_count = 0
+
+    def add(result, offset):
+        nonlocal concern_error_count
+        totals["inserted"] += result.get("nInserted", 0)
+        totals["matched"] += result.get("nMatched", 0)
+        totals["modified"] += result.get("nModified", 0)
+        totals["upserted"] += result.get("nUpserted", 0)
+        totals["deleted"] += result.get("nRemoved", 0)
+        for err in result.get("writeConcernErrors", []):
+            concern_error_count += 1
+            if len(concern_errors) < MAX_REPORTED_ERRORS:
+                concern_errors.append({"chunk_start": offset, "code": err.get("code"), "message": err.get("errmsg")})
+
+    for offset in range(0, len(operations), WRITE_CHUNK_SIZE):
+        chunk = operations[offset:offset + WRITE_CHUNK_SIZE]
+        try:
+            result = collection.bulk_write(chunk, ordered=ordered)
+            if result.acknowledged:
+                add(result.bulk_api_result, offset)
+        except BulkWriteError as e:
+            add(e.details, offset)
+            for err in e.details.get("writeErrors", []):
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"index": offset + err["index"], "code": err.get("code"), "message": err.get("errmsg")})
+            if ordered:
+                break
+
+    return {**totals, "operations": len(operations), "error_count": error_count, "errors": errors,
+            "write_concern_error_count": concern_error_count, "write_concern_errors": concern_errors}
+
 
 def register_document_tools(db, mcp):
     # Insert a single document into the specified collection
-    @mcp.tool("insertOne")
+    @blocking_tool(mcp, "insertOne")
     def insert_one(data: dict) -> str:
         collection = data.get("collection")
         document = data.get("document")
@@ -14,7 +99,7 @@ def register_document_tools(db, mcp):
         return f"Inserted document with ID: {result.inserted_id}"
 
     # Update a single document based on a filter
-    @mcp.tool("updateOne")
+    @blocking_tool(mcp, "updateOne")
     def update_one(data: dict) -> str:
         collection = data.get("collection")
         filter_query = data.get("filter")
@@ -27,7 +112,7 @@ def register_document_tools(db, mcp):
         return f"Matched {result.matched_count}, Modified {result.modified_count}"
 
     #  Delete a single document matching the filter
-    @mcp.tool("deleteOne")
+    @blocking_tool(mcp, "deleteOne")
     def delete_one(data: dict) -> str:
         collection = data.get("collection")
         filter_query = data.get("filter")
@@ -37,3 +122,43 @@ def register_document_tools(db, mcp):
 
         result = db[collection].delete_one(filter_query)
         return f" Deleted {result.deleted_count} document"
+
+    # Insert many documents with unordered, chunked bulk writes
+    @blocking_tool(mcp, "insertMany", limit=2)
+    def insert_many(data: dict) -> dict | str:
+        collection = data.get("collection")
+        documents = data.get("documents")
+
+        if not collection or not isinstance(documents, list) or not documents:
+            return "'collection' and a non-empty 'documents' list are required"
+
+        try:
+            return bulk_write(db[collection], [InsertOne(doc) for doc in documents],
+                              data.get("writeConcern"), data.get("ordered", False))
+        except Exception as e:
+            return f" Error during insertMany: {str(e)}"
+
+    # Mixed insert/update/replace/delete operations in one bulk write
+    @blocking_tool(mcp, "bulkWrite", limit=2)
+    def bulk_write_tool(data: dict) -> dict | str:
+        """
+        operations use the shell syntax, e.g.
+        [{"insertOne": {"document": {...}}},
+         {"updateOne": {"filter": {...}, "update": {...}, "upsert": true}},
+         {"deleteOne": {"filter": {...}}}]
+        """
+        collection = data.get("collection")
+        operations = data.get("operations")
+
+        if not collection or not isinstance(operations, list) or not operations:
+            return "'collection' and a non-empty 'operations' list are required"
+
+        try:
+            requests = [_to_operation(op) for op in operations]
+        except (KeyError, ValueError) as e:
+            return f" Invalid operation: {str(e)}"
+
+        try:
+            return bulk_write(db[collection], requests, data.get("writeConcern"), data.get("ordered", False))
+        except Exception as e:
+            return f" Error during bulkWrite: {str(e)}"
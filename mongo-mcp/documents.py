@@ -0,0 +1,34 @@
+# documents.py
+import metrics
+from serialization import encode_value, to_payload
+
+
+def documents_to_payload(documents, fmt: str = "columnar") -> dict:
+    """Columnar form of Mongo documents; missing fields become null."""
+    columns = []
+    seen = set()
+    for doc in documents:
+        for key in doc:
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+    rows = [[doc.get(col) for col in columns] for doc in documents]
+    return to_payload(columns, rows, fmt)
+
+
+def shape_documents(result, fmt=None):
+    """Mongo read results (a list, or a page dict with "documents") in the requested format.
+
+    With fmt None documents stay documents, but still go through
+    encode_value so ObjectId and datetime values serialize.
+    """
+    with metrics.phase("serialize"):
+        if fmt is None:
+            if isinstance(result, dict):
+                return {**result, "documents": [encode_value(doc) for doc in result["documents"]]}
+            return [encode_value(doc) for doc in result]
+        if isinstance(result, dict):
+            documents = result.pop("documents")
+            result.pop("count", None)
+            return {**documents_to_payload(documents, fmt), **result}
+        return documents_to_payload(result, fmt)
@@ -1,9 +1,10 @@
 from pymongo import MongoClient
 from mcp.server.fastmcp import FastMCP
+from executor import blocking_tool
 
 # Assume db and mcp are passed in or shared (we'll use this from main file)
 def register_index_tools(db, mcp):
-    @mcp.tool("createIndex")
+    @blocking_tool(mcp, "createIndex")
     def create_index(data: dict) -> str:
         collection = data.get("collection")
         field = data.get("field")
@@ -15,7 +16,7 @@ def register_index_tools(db, mcp):
         index_name = db[collection].create_index([(field, 1)], unique=unique)
         return f" Created index: {index_name}"
 
-    @mcp.tool("dropIndex")
+    @blocking_tool(mcp, "dropIndex")
     def drop_index(data: dict) -> str:
         collection = data.get("collection")
         index = data.get("index")
@@ -26,7 +27,7 @@ def register_index_tools(db, mcp):
         db[collection].drop_index(index)
         return f" Dropped index: {index}"
 
-    @mcp.tool("indexes")
+    @blocking_tool(mcp, "indexes")
     def list_indexes(data: dict) -> list:
         collection = data.get("collection")
 
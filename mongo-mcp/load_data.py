@@ -1,49 +1,130 @@
+import numpy as np
 import pandas as pd
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import BulkWriteError
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
 import os
+import time
 
 # Load environment variables
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME")
+# Documents per insert_many call, parallel writers
+CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", "5000"))
+WORKERS = int(os.getenv("LOAD_WORKERS", "4"))
 
 client = MongoClient(MONGO_URI)
 db = client[DB_NAME]
 
+# Unique keys make re-running the load a no-op instead of needing drop()
+UNIQUE_KEYS = {
+    "products": ["code", "name", "price"],
+    "users": ["user_id", "Country"],
+    "orders": ["invoice"],
+}
+
+
+def insert_chunk(collection, documents):
+    """Unordered insert of one chunk; existing documents count as skipped."""
+    try:
+        return len(db[collection].insert_many(documents, ordered=False).inserted_ids), 0
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        duplicates = sum(1 for err in errors if err.get("code") == 11000)
+        if duplicates != len(errors):
+            raise
+        return e.details.get("nInserted", 0), duplicates
+
+
+def load(collection, chunks):
+    """Insert chunks from a worker pool, keeping at most 2 * WORKERS in flight."""
+    start = time.perf_counter()
+    db[collection].create_index([(key, ASCENDING) for key in UNIQUE_KEYS[collection]], unique=True)
+    inserted = skipped = 0
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        pending = set()
+        for documents in chunks:
+            if len(pending) >= 2 * WORKERS:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    n, dup = future.result()
+                    inserted, skipped = inserted + n, skipped + dup
+            pending.add(executor.submit(insert_chunk, collection, documents))
+        for future in pending:
+            n, dup = future.result()
+            inserted, skipped = inserted + n, skipped + dup
+    elapsed = time.perf_counter() - start
+    print(f"  {collection}: {inserted} inserted, {skipped} already present "
+          f"in {elapsed:.2f}s ({(inserted + skipped) / elapsed if elapsed else 0:,.0f} docs/s)")
+
+
+def frame_chunks(frame):
+    for offset in range(0, len(frame), CHUNK_SIZE):
+        yield frame.iloc[offset:offset + CHUNK_SIZE].to_dict(orient="records")
+
+
+def group_orders(lines):
+    """Group invoice lines by invoice with array operations only.
+
+    Returns the lines reordered so each invoice's lines are contiguous
+    (invoices in first-seen order), the invoice numbers, the offset where
+    each invoice's lines end and each invoice's total.
+    """
+    keys, invoices = pd.factorize(lines["InvoiceNo"])
+    totals = np.bincount(keys, weights=(lines["Quantity"] * lines["UnitPrice"]).to_numpy())
+    lines = lines.iloc[np.argsort(keys, kind="stable")]
+    return lines, invoices, np.cumsum(np.bincount(keys)), totals
+
+
+def order_chunks(lines, invoices, ends, totals):
+    """Order documents CHUNK_SIZE invoices at a time; only the items are built per line."""
+    codes = lines["StockCode"].to_numpy()
+    quantities = lines["Quantity"].to_numpy()
+    customers = lines["CustomerID"].to_numpy()
+    starts = np.concatenate(([0], ends[:-1]))
+    for offset in range(0, len(invoices), CHUNK_SIZE):
+        stop = min(offset + CHUNK_SIZE, len(invoices))
+        first, last = starts[offset], ends[stop - 1]
+        items = [
+            {"StockCode": code, "Quantity": qty}
+            for code, qty in zip(codes[first:last].tolist(), quantities[first:last].tolist())
+        ]
+        yield [
+            {"invoice": invoice, "customer_id": customer_id, "items": items[start - first:end - first], "total": total}
+            for invoice, customer_id, start, end, total in zip(
+                invoices[offset:stop].tolist(), customers[starts[offset:stop]].tolist(),
+                starts[offset:stop].tolist(), ends[offset:stop].tolist(), totals[offset:stop].tolist()
+            )
+        ]
+
+
 # Load the data.csv file
-df = pd.read_csv("data.csv", encoding="ISO-8859-1")
+df = pd.read_csv(
+    "data.csv",
+    encoding="ISO-8859-1",
+    usecols=["InvoiceNo", "StockCode", "Description", "Quantity", "UnitPrice", "CustomerID", "Country"],
+    dtype={"InvoiceNo": str, "StockCode": str, "Description": str, "Country": str},
+)
 
 # Drop rows with no CustomerID
 df = df.dropna(subset=["CustomerID"])
 
 # Products collection
+print("Loading products...")
 products = df[["StockCode", "Description", "UnitPrice"]].drop_duplicates()
 products = products.rename(columns={"StockCode": "code", "Description": "name", "UnitPrice": "price"})
-db.products.drop()
-db.products.insert_many(products.to_dict(orient="records"))
+load("products", frame_chunks(products))
 
 # Users collection
+print("Loading users...")
 users = df[["CustomerID", "Country"]].drop_duplicates()
 users = users.rename(columns={"CustomerID": "user_id"})
-db.users.drop()
-db.users.insert_many(users.to_dict(orient="records"))
+load("users", frame_chunks(users))
 
 #  Orders collection
-orders = []
-for invoice, group in df.groupby("InvoiceNo"):
-    items = group[["StockCode", "Quantity"]].to_dict(orient="records")
-    total = (group["Quantity"] * group["UnitPrice"]).sum()
-    customer_id = group["CustomerID"].iloc[0]
-    orders.append({
-        "invoice": invoice,
-        "customer_id": customer_id,
-        "items": items,
-        "total": total
-    })
-
-db.orders.drop()
-db.orders.insert_many(orders)
+print("Loading orders...")
+load("orders", order_chunks(*group_orders(df)))
 
 print("Data loaded into MongoDB: products, users, orders.")
-
@@ -1,19 +1,30 @@
 # mongo_db_mcp.py
 
+import os
+import sys
+
+# Modules used by every server (metrics, executor, serialization) live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+
 from mcp.server.fastmcp import FastMCP
 from pymongo import MongoClient
 from dotenv import load_dotenv
-import os
+import logging
 
 # Import tool registration functions from other files
 from index_tools import register_index_tools
 from query_tools import register_query_tools
 from document_tools import register_document_tools
+from stats_tools import register_stats_tools
+from executor import blocking_tool
+import metrics
 
 # Load environment variables from .env
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME")
+# DEBUG shows per-call query logging
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
 
 # Connect to MongoDB
 client = MongoClient(MONGO_URI)
@@ -26,9 +37,24 @@ mcp = FastMCP("MongoDB MCP")
 register_index_tools(db, mcp)
 register_query_tools(db, mcp)
 register_document_tools(db, mcp)
+register_stats_tools(db, mcp)
+
+
+# Per-tool latency, DB vs serialization time, rows, bytes and errors
+@blocking_tool(mcp, "metrics")
+def metrics_tool(data: dict = {}) -> dict:
+    """
+    Per-tool call counts, errors, latency percentiles, DB and serialization
+    time, rows and bytes returned. format="prometheus" returns Prometheus text in "text".
+    """
+    if data.get("format") == "prometheus":
+        return {"format": "prometheus", "text": metrics.prometheus_text()}
+    return metrics.snapshot()
+
 
 # Run the MCP server
 if __name__ == "__main__":
+    metrics.start_exporters()
     mcp.run(transport="stdio")
 
 
@@ -1,11 +1,374 @@
+import os
+import json
+import time
+import itertools
+import logging
+import datetime
+import re
+import uuid
+import base64
+import threading
+from bson import Binary, Decimal128, Int64, ObjectId, Regex, Timestamp, json_util
+from serialization import format_of, budget_of, fetch_within
+from documents import documents_to_payload, shape_documents
+from executor import blocking_tool, progress_reporter
+import metrics
+
+logger = logging.getLogger("mongo_mcp")
+
+# Unpaged finds are capped so an unfiltered find can't pull a whole collection
+FIND_DEFAULT_LIMIT = int(os.getenv("FIND_DEFAULT_LIMIT", "1000"))
+FIND_PAGE_SIZE = int(os.getenv("FIND_PAGE_SIZE", "100"))
+FIND_MAX_PAGE_SIZE = int(os.getenv("FIND_MAX_PAGE_SIZE", "5000"))
+# Server-side time budgets (ms); a call may pass maxTimeMS up to MAX_TIME_MS_LIMIT
+FIND_MAX_TIME_MS = int(os.getenv("FIND_MAX_TIME_MS", "30000"))
+MAX_TIME_MS_LIMIT = int(os.getenv("MAX_TIME_MS_LIMIT", "300000"))
+# Aggregation settings; unread aggregate cursors are killed after the TTL
+AGGREGATE_MAX_TIME_MS = int(os.getenv("AGGREGATE_MAX_TIME_MS", "30000"))
+AGGREGATE_CURSOR_TTL = float(os.getenv("AGGREGATE_CURSOR_TTL", "300"))
+AGGREGATE_MAX_OPEN_CURSORS = int(os.getenv("AGGREGATE_MAX_OPEN_CURSORS", "16"))
+
+# Matching documents counted for the total estimate of a truncated find
+TRUNCATED_COUNT_LIMIT = int(os.getenv("TRUNCATED_COUNT_LIMIT", "100000"))
+
+# Stages that write; aggregate is a read tool
+WRITE_STAGES = ("$out", "$merge")
+
+
+def max_time_ms_of(data: dict, default: int) -> int:
+    try:
+        max_time_ms = int(data.get("maxTimeMS") or default)
+    except (TypeError, ValueError):
+        raise ValueError("'maxTimeMS' must be an integer.")
+    return max(1, min(max_time_ms, MAX_TIME_MS_LIMIT))
+
+
+def _encode_token(state: dict) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(state).encode()).decode()
+
+
+def _decode_token(token: str) -> dict:
+    return json_util.loads(base64.urlsafe_b64decode(token.encode()).decode())
+
+
+def _sort_spec(sort) -> list:
+    """Normalize a sort argument and make it unique by ending on _id."""
+    if isinstance(sort, dict):
+        spec = [(k, int(v)) for k, v in sort.items()]
+    else:
+        spec = [(k, int(v)) for k, v in (sort or [])]
+    if not any(k == "_id" for k, _ in spec):
+        spec.append(("_id", 1))
+    return spec
+
+
+def _get_path(doc: dict, path: str):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+# BSON types by sort position; $gt/$lt only match values in the same bracket
+TYPE_BRACKETS = [
+    ["null"],
+    ["double", "int", "long", "decimal"],
+    ["string", "symbol"],
+    ["object"],
+    ["array"],
+    ["binData"],
+    ["objectId"],
+    ["bool"],
+    ["date"],
+    ["timestamp"],
+    ["regex"],
+]
+
+
+def _bracket(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 7
+    if isinstance(value, (int, float, Int64, Decimal128)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, (list, tuple)):
+        return 4
+    if isinstance(value, (bytes, Binary)):
+        return 5
+    if isinstance(value, ObjectId):
+        return 6
+    if isinstance(value, datetime.datetime):
+        return 8
+    if isinstance(value, Timestamp):
+        return 9
+    if isinstance(value, (Regex, re.Pattern)):
+        return 10
+    raise ValueError(f"Can't page on a sort key holding {type(value).__name__} values")
+
+
+def _past(key: str, value, direction: int) -> list:
+    """Filters matching values of `key` strictly after `value` in sort order.
+
+    Values of other types sort by type bracket, so besides $gt/$lt within
+    the bracket every later (or, descending, earlier) bracket is matched by
+    $type; null and missing fields sort first.
+    """
+    bracket = _bracket(value)
+    if bracket == 4:
+        raise ValueError(f"Can't page on '{key}': array values sort by their elements")
+    if direction > 0:
+        if bracket == 0:
+            return [{key: {"$ne": None}}]
+        later = [t for types in TYPE_BRACKETS[bracket + 1:] for t in types]
+        return [{key: {"$gt": value}}, {key: {"$type": later}}]
+    if bracket == 0:
+        return []
+    earlier = [t for types in TYPE_BRACKETS[1:bracket] for t in types]
+    clauses = [{key: {"$lt": value}}, {key: None}]
+    if earlier:
+        clauses.append({key: {"$type": earlier}})
+    return clauses
+
+
+def _after(spec: list, last: list) -> dict:
+    """Range filter selecting documents strictly after `last` in sort order.
+
+    For keys k1..kn this is (k1 > v1) OR (k1 == v1 AND k2 > v2) OR ...
+    which lets the server seek on an index instead of skipping documents.
+    The spec includes _id, so every document has exactly one position.
+    """
+    clauses = []
+    for i, (key, direction) in enumerate(spec):
+        equal = {k: v for (k, _), v in zip(spec[:i], last[:i])}
+        clauses.extend({**equal, **past} for past in _past(key, last[i], direction))
+    return {"$or": clauses}
+
+
+def _fetch_projection(projection: dict, spec: list):
+    """Projection that also returns the sort keys, plus the fields to strip again."""
+    keys = [k for k, _ in spec]
+    if not projection:
+        return None, []
+    inclusive = any(v for k, v in projection.items() if k != "_id")
+    fetch = dict(projection)
+    strip = []
+    for key in keys:
+        if inclusive and key == "_id" and "_id" not in fetch:
+            continue  # _id is returned by default
+        if inclusive and not fetch.get(key):
+            fetch[key] = 1
+            strip.append(key)
+        elif not inclusive and key in fetch and not fetch[key]:
+            del fetch[key]
+            strip.append(key)
+    if not fetch:
+        fetch = None
+    return fetch, strip
+
+
+def _strip(doc: dict, path: str):
+    head, _, rest = path.partition(".")
+    if not rest:
+        doc.pop(head, None)
+        return
+    child = doc.get(head)
+    if isinstance(child, dict):
+        _strip(child, rest)
+        if not child:
+            del doc[head]
+
+
+def find_page(collection, filter_query: dict, projection: dict, sort, page_size: int, last=None,
+              max_time_ms: int = FIND_MAX_TIME_MS) -> dict:
+    """Fetch one page of a find, resuming after the `last` sort-key values."""
+    spec = _sort_spec(sort)
+    query = filter_query
+    if last is not None:
+        query = {"$and": [filter_query, _after(spec, last)]} if filter_query else _after(spec, last)
+
+    fetch, strip = _fetch_projection(projection, spec)
+    cursor = collection.find(query, fetch, sort=spec, limit=page_size + 1, batch_size=page_size + 1,
+                             max_time_ms=max_time_ms)
+    with metrics.phase("db"):
+        documents = list(cursor)
+
+    next_token = None
+    if len(documents) > page_size:
+        documents = documents[:page_size]
+        last_doc = documents[-1]
+        next_token = _encode_token({
+            "collection": collection.name,
+            "filter": filter_query,
+            "projection": projection,
+            "sort": spec,
+            "last": [_get_path(last_doc, k) for k, _ in spec],
+        })
+
+    for doc in documents:
+        for key in strip:
+            _strip(doc, key)
+    return {"documents": documents, "count": len(documents), "next_token": next_token}
+
+
+_cursors = {}   # token -> (cursor, touched, documents sent)
+_cursors_lock = threading.Lock()
+
+
+def _expire_cursors():
+    now = time.monotonic()
+    with _cursors_lock:
+        expired = [t for t, (_, touched, _) in _cursors.items() if now - touched > AGGREGATE_CURSOR_TTL]
+        cursors = [_cursors.pop(t)[0] for t in expired]
+    for cursor in cursors:
+        cursor.close()
+
+
+def _with_limit(pipeline: list, limit: int) -> list:
+    """Make sure the pipeline ends in a $limit of at most `limit`."""
+    last = pipeline[-1] if pipeline else {}
+    if isinstance(last, dict) and isinstance(last.get("$limit"), int) and last["$limit"] <= limit:
+        return pipeline
+    return pipeline + [{"$limit": limit}]
+
+
+def _aggregate_batch(token: str, cursor, page_size: int, sent: int) -> dict:
+    """Read one page from an aggregate cursor; keep the cursor if more remains."""
+    documents = []
+    with metrics.phase("db"):
+        for doc in cursor:
+            documents.append(doc)
+            if len(documents) == page_size:
+                break
+    sent += len(documents)
+    if len(documents) < page_size or not cursor.alive:
+        cursor.close()
+        token = None
+    else:
+        with _cursors_lock:
+            _cursors[token] = (cursor, time.monotonic(), sent)
+    return {"documents": documents, "count": len(documents), "documents_sent": sent, "next_token": token}
+
+
+def aggregate_page(collection, pipeline: list, page_size: int, allow_disk_use: bool = False,
+                   max_time_ms: int = AGGREGATE_MAX_TIME_MS) -> dict:
+    """Run a pipeline inside mongod and return its first page.
+
+    The server cursor stays open between pages (batchSize = page_size), so
+    each page is one getMore instead of re-running the pipeline.
+    """
+    _expire_cursors()
+    with _cursors_lock:
+        if len(_cursors) >= AGGREGATE_MAX_OPEN_CURSORS:
+            raise RuntimeError(f"Too many open aggregate cursors ({AGGREGATE_MAX_OPEN_CURSORS}); "
+                               "read one to the end first")
+    cursor = collection.aggregate(pipeline, allowDiskUse=allow_disk_use,
+                                  maxTimeMS=max_time_ms, batchSize=page_size)
+    return _aggregate_batch(uuid.uuid4().hex, cursor, page_size, 0)
+
+
+def next_aggregate_page(token: str, page_size: int) -> dict:
+    _expire_cursors()
+    with _cursors_lock:
+        entry = _cursors.pop(token, None)
+    if entry is None:
+        raise KeyError("Unknown or expired continuation_token")
+    cursor, _, sent = entry
+    try:
+        return _aggregate_batch(token, cursor, page_size, sent)
+    except Exception:
+        cursor.close()
+        raise
+
+
+def read_within(cursor, budget, report=None, estimate=None):
+    """Read a find or aggregate cursor until it ends or the response budget is spent.
+
+    The server cursor is closed as soon as the budget runs out. Returns the
+    documents as a list, or as a page-shaped dict when the result was cut
+    ("truncated", with estimate() as the total) or streamed: with report,
+    documents go out as columnar progress notifications instead.
+    """
+    on_chunk = None
+    if report:
+        def on_chunk(documents):
+            report(budget.rows, None, json.dumps(documents_to_payload(documents)))
+    with metrics.phase("db"):
+        documents = fetch_within(lambda n: list(itertools.islice(cursor, n)), budget, on_chunk)
+    if budget.exhausted:
+        cursor.close()
+    if not budget.exhausted and not report:
+        return documents
+
+    result = {"documents": documents, "count": len(documents)}
+    if report:
+        result["streamed_documents"] = budget.rows
+    if budget.exhausted:
+        try:
+            estimated = estimate() if estimate else None
+        except Exception as e:
+            logger.warning("Could not estimate total documents: %s", e)
+            estimated = None
+        result["truncated"] = budget.marker(estimated)
+    return result
+
+
+def _estimate_total(collection, filter_query: dict, max_time_ms: int):
+    """Matching documents, from metadata when unfiltered; counting stops at TRUNCATED_COUNT_LIMIT."""
+    if not filter_query:
+        return collection.estimated_document_count(maxTimeMS=max_time_ms)
+    return collection.count_documents(filter_query, limit=TRUNCATED_COUNT_LIMIT, maxTimeMS=max_time_ms)
+
+
 def register_query_tools(db, mcp):
-    @mcp.tool("find")
-    def find_documents(data: dict = {}) -> list:
+    @blocking_tool(mcp, "find")
+    def find_documents(data: dict = {}) -> list | dict | str:
         """
         Finds documents in MongoDB with optional prompt-based collection inference.
         Supports optional filtering, projection, and limiting.
+        Pass page_size (and optionally sort) to page through results; each page
+        returns a next_token to pass back as continuation_token.
+        format="columnar" or "arrow" returns field names once plus row lists.
+        maxTimeMS bounds the query on the server. max_rows/max_bytes stop
+        reading once the response is that large; the result then carries a
+        "truncated" marker with an estimated total. stream=true sends the
+        documents as progress notifications instead of in the result.
         """
-        print("DEBUG - find_documents called with:", data)
+        logger.debug("find called with: %s", data)
+
+        try:
+            fmt = format_of(data) if data.get("format") else None
+            budget = budget_of(data)
+        except ValueError as e:
+            return f" {e}"
+        try:
+            max_time_ms = max_time_ms_of(data, FIND_MAX_TIME_MS)
+        except ValueError as e:
+            return f" {e}"
+
+        try:
+            page_size = int(data.get("page_size") or FIND_PAGE_SIZE)
+        except (TypeError, ValueError):
+            page_size = FIND_PAGE_SIZE
+        page_size = max(1, min(page_size, FIND_MAX_PAGE_SIZE))
+
+        token = data.get("continuation_token")
+        if token:
+            try:
+                state = _decode_token(token)
+            except Exception:
+                return " Invalid 'continuation_token'."
+            try:
+                return shape_documents(find_page(db[state["collection"]], state["filter"], state["projection"],
+                                        state["sort"], page_size, last=state["last"],
+                                        max_time_ms=max_time_ms), fmt)
+            except Exception as e:
+                return f" Error during find: {str(e)}"
 
         collection = data.get("collection")
         prompt = str(data.get("prompt", "")).lower()
@@ -25,21 +388,104 @@ def register_query_tools(db, mcp):
         limit = data.get("limit")
 
         try:
-            cursor = db[collection].find(filter_query, projection)
-            if limit:
-                cursor = cursor.limit(int(limit))  # only apply limit if given
-            documents = list(cursor)
-            print(f"DEBUG - Returning {len(documents)} documents from '{collection}'")
-            return documents
+            if "page_size" in data:
+                return shape_documents(find_page(db[collection], filter_query, projection,
+                                        data.get("sort"), page_size, max_time_ms=max_time_ms), fmt)
+
+            limit = int(limit) if limit else FIND_DEFAULT_LIMIT
+            sort = list(data["sort"].items()) if isinstance(data.get("sort"), dict) else data.get("sort")
+            report = progress_reporter() if data.get("stream") else None
+            if budget.max_rows and budget.max_rows < limit:
+                # One past the budget, so a cut result can be told from an exact fit
+                limit = budget.max_rows + 1
+            cursor = db[collection].find(filter_query, projection, sort=sort, limit=limit,
+                                         batch_size=min(limit, FIND_MAX_PAGE_SIZE), max_time_ms=max_time_ms)
+            if budget.limited or report:
+                return shape_documents(read_within(cursor, budget, report,
+                                          lambda: _estimate_total(db[collection], filter_query, max_time_ms)), fmt)
+            with metrics.phase("db"):
+                documents = list(cursor)
+            logger.debug("Returning %d documents from '%s'", len(documents), collection)
+            return shape_documents(documents, fmt)
         except Exception as e:
             return f" Error during find: {str(e)}"
 
 
+    @blocking_tool(mcp, "aggregate")
+    def aggregate(data: dict = {}) -> list | dict | str:
+        """
+        Runs an aggregation pipeline inside MongoDB, e.g. revenue per customer:
+        [{"$group": {"_id": "$customer_id", "revenue": {"$sum": "$total"}}}].
+        Without page_size the result is capped by a trailing $limit (limit,
+        default FIND_DEFAULT_LIMIT). With page_size results stream in pages;
+        pass next_token back as continuation_token.
+        Options: allowDiskUse, maxTimeMS, format ("columnar" or "arrow"),
+        max_rows/max_bytes and stream, as for find.
+        $out and $merge are not allowed.
+        """
+        try:
+            fmt = format_of(data) if data.get("format") else None
+            budget = budget_of(data)
+        except ValueError as e:
+            return f" {e}"
+
+        try:
+            page_size = int(data.get("page_size") or FIND_PAGE_SIZE)
+        except (TypeError, ValueError):
+            page_size = FIND_PAGE_SIZE
+        page_size = max(1, min(page_size, FIND_MAX_PAGE_SIZE))
+
+        token = data.get("continuation_token")
+        if token:
+            try:
+                return shape_documents(next_aggregate_page(token, page_size), fmt)
+            except KeyError as e:
+                return f" {e.args[0]}."
+            except Exception as e:
+                return f" Error during aggregate: {str(e)}"
+
+        collection = data.get("collection")
+        pipeline = data.get("pipeline", [])
+        if not collection:
+            return " 'collection' is missing."
+        if not isinstance(pipeline, list):
+            return " 'pipeline' must be a list of stages."
+        if any(isinstance(stage, dict) and stage.keys() & set(WRITE_STAGES) for stage in pipeline):
+            return f" Stages {' and '.join(WRITE_STAGES)} are not allowed."
+
+        allow_disk_use = bool(data.get("allowDiskUse", False))
+        try:
+            max_time_ms = max_time_ms_of(data, AGGREGATE_MAX_TIME_MS)
+        except ValueError as e:
+            return f" {e}"
+
+        try:
+            if "page_size" in data:
+                return shape_documents(aggregate_page(db[collection], pipeline, page_size,
+                                             allow_disk_use, max_time_ms), fmt)
+
+            limit = int(data.get("limit") or FIND_DEFAULT_LIMIT)
+            report = progress_reporter() if data.get("stream") else None
+            if budget.max_rows and budget.max_rows < limit:
+                limit = budget.max_rows + 1
+            cursor = db[collection].aggregate(_with_limit(pipeline, limit), allowDiskUse=allow_disk_use,
+                                              maxTimeMS=max_time_ms,
+                                              batchSize=min(limit, FIND_MAX_PAGE_SIZE))
+            if budget.limited or report:
+                # A pipeline's total is unknown without running it to the end
+                return shape_documents(read_within(cursor, budget, report), fmt)
+            with metrics.phase("db"):
+                documents = list(cursor)
+            return shape_documents(documents, fmt)
+        except Exception as e:
+            return f" Error during aggregate: {str(e)}"
+
+
     #  Lists all collection names
-    @mcp.tool("listCollections")
+    @blocking_tool(mcp, "listCollections")
     def list_collections(data: dict = {}) -> list:
         collections = db.list_collection_names()
-        print(f"DEBUG - listCollections found: {collections}")
+        logger.debug("listCollections found: %s", collections)
         return collections
 
 
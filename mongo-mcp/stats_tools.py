@@ -0,0 +1,136 @@
+# stats_tools.py
+import os
+from executor import blocking_tool
+from query_tools import AGGREGATE_MAX_TIME_MS, max_time_ms_of
+from serialization import format_of
+from documents import shape_documents
+import metrics
+
+# Caps for values returned by distinct and documents returned by sample
+DISTINCT_MAX_VALUES = int(os.getenv("DISTINCT_MAX_VALUES", "1000"))
+SAMPLE_DEFAULT_SIZE = int(os.getenv("SAMPLE_DEFAULT_SIZE", "20"))
+SAMPLE_MAX_SIZE = int(os.getenv("SAMPLE_MAX_SIZE", "1000"))
+
+
+def distinct_values(collection, key: str, filter_query: dict = None, cap: int = DISTINCT_MAX_VALUES,
+                    max_time_ms: int = AGGREGATE_MAX_TIME_MS) -> dict:
+    """Distinct values of `key`, grouped and capped inside mongod.
+
+    Unlike the distinct command this never builds one result document with
+    every value, so high-cardinality fields stay cheap.
+    """
+    pipeline = [{"$match": filter_query}] if filter_query else []
+    pipeline += [
+        {"$project": {"_id": 0, "value": f"${key}"}},
+        {"$unwind": "$value"},
+        {"$group": {"_id": "$value"}},
+        {"$sort": {"_id": 1}},
+        {"$limit": cap + 1},
+    ]
+    values = [doc["_id"] for doc in collection.aggregate(pipeline, maxTimeMS=max_time_ms)]
+    return {"key": key, "values": values[:cap], "count": min(len(values), cap), "truncated": len(values) > cap}
+
+
+def collection_stats(collection) -> dict:
+    """Storage statistics from $collStats, summed over shards."""
+    stats = {"count": 0, "size": 0, "storageSize": 0, "nindexes": 0, "totalIndexSize": 0, "indexSizes": {}}
+    for shard in collection.aggregate([{"$collStats": {"storageStats": {}}}]):
+        storage = shard.get("storageStats", {})
+        for key in ("count", "size", "storageSize", "totalIndexSize"):
+            stats[key] += storage.get(key, 0)
+        stats["nindexes"] = max(stats["nindexes"], storage.get("nindexes", 0))
+        for name, size in storage.get("indexSizes", {}).items():
+            stats["indexSizes"][name] = stats["indexSizes"].get(name, 0) + size
+    stats["avgObjSize"] = stats["size"] // stats["count"] if stats["count"] else 0
+    return {"collection": collection.name, **stats}
+
+
+def register_stats_tools(db, mcp):
+    # Count from collection metadata, without scanning
+    @blocking_tool(mcp, "estimatedDocumentCount")
+    def estimated_document_count(data: dict) -> dict | str:
+        collection = data.get("collection")
+        if not collection:
+            return " 'collection' is required"
+        try:
+            return {"collection": collection, "count": db[collection].estimated_document_count()}
+        except Exception as e:
+            return f" Error during estimatedDocumentCount: {str(e)}"
+
+    # Exact count of documents matching a filter
+    @blocking_tool(mcp, "count")
+    def count_documents(data: dict) -> dict | str:
+        """
+        Counts documents matching filter. Optional hint (index name or key
+        pattern) picks the index, and limit stops counting early.
+        """
+        collection = data.get("collection")
+        if not collection:
+            return " 'collection' is required"
+
+        try:
+            options = {"maxTimeMS": max_time_ms_of(data, AGGREGATE_MAX_TIME_MS)}
+        except ValueError as e:
+            return f" {e}"
+        if data.get("hint"):
+            hint = data["hint"]
+            options["hint"] = list(hint.items()) if isinstance(hint, dict) else hint
+        try:
+            if data.get("limit"):
+                options["limit"] = int(data["limit"])
+            return {"collection": collection, "count": db[collection].count_documents(data.get("filter", {}), **options)}
+        except Exception as e:
+            return f" Error during count: {str(e)}"
+
+    # Distinct values of a field, capped
+    @blocking_tool(mcp, "distinct")
+    def distinct(data: dict) -> dict | str:
+        collection = data.get("collection")
+        key = data.get("key")
+        if not collection or not key:
+            return " 'collection' and 'key' are required"
+
+        try:
+            cap = max(1, min(int(data.get("limit") or DISTINCT_MAX_VALUES), DISTINCT_MAX_VALUES))
+            return distinct_values(db[collection], key, data.get("filter"), cap,
+                                   max_time_ms_of(data, AGGREGATE_MAX_TIME_MS))
+        except Exception as e:
+            return f" Error during distinct: {str(e)}"
+
+    # Document count, data size, average object size and index sizes
+    @blocking_tool(mcp, "collStats")
+    def coll_stats(data: dict) -> dict | str:
+        collection = data.get("collection")
+        if not collection:
+            return " 'collection' is required"
+        try:
+            return collection_stats(db[collection])
+        except Exception as e:
+            return f" Error during collStats: {str(e)}"
+
+    # Random documents via $sample
+    @blocking_tool(mcp, "sample")
+    def sample(data: dict) -> list | dict | str:
+        """
+        Returns `size` random documents. Without a filter $sample runs first,
+        so mongod picks documents randomly instead of scanning the collection.
+        Optional projection and format ("columnar" or "arrow").
+        """
+        collection = data.get("collection")
+        if not collection:
+            return " 'collection' is required"
+        try:
+            fmt = format_of(data) if data.get("format") else None
+        except ValueError as e:
+            return f" {e}"
+
+        try:
+            size = max(1, min(int(data.get("size") or SAMPLE_DEFAULT_SIZE), SAMPLE_MAX_SIZE))
+            pipeline = [{"$match": data["filter"]}] if data.get("filter") else []
+            pipeline.append({"$sample": {"size": size}})
+            pipeline.append({"$project": data.get("projection") or {"_id": 0}})
+            with metrics.phase("db"):
+                documents = list(db[collection].aggregate(pipeline, maxTimeMS=max_time_ms_of(data, AGGREGATE_MAX_TIME_MS)))
+            return shape_documents(documents, fmt)
+        except Exception as e:
+            return f" Error during sample: {str(e)}"
@@ -0,0 +1,58 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from query_tools import TYPE_BRACKETS, _after, _sort_spec
+
+NUMBERS_ON = [t for types in TYPE_BRACKETS[2:] for t in types]
+BEFORE_DATES = [t for types in TYPE_BRACKETS[1:8] for t in types]
+
+
+def test_sort_spec_ends_on_id():
+    assert _sort_spec({"a": -1}) == [("a", -1), ("_id", 1)]
+    assert _sort_spec([["_id", -1], ["a", 1]]) == [("_id", -1), ("a", 1)]
+
+
+def test_ascending_after_a_number_includes_later_types():
+    oid = ObjectId()
+    assert _after([("a", 1), ("_id", 1)], [5, oid]) == {"$or": [
+        {"a": {"$gt": 5}},
+        {"a": {"$type": NUMBERS_ON}},
+        {"a": 5, "_id": {"$gt": oid}},
+        {"a": 5, "_id": {"$type": [t for types in TYPE_BRACKETS[7:] for t in types]}},
+    ]}
+
+
+def test_ascending_after_null_skips_null_and_missing():
+    assert _after([("a", 1), ("_id", 1)], [None, 3]) == {"$or": [
+        {"a": {"$ne": None}},
+        {"a": None, "_id": {"$gt": 3}},
+        {"a": None, "_id": {"$type": NUMBERS_ON}},
+    ]}
+
+
+def test_descending_after_a_date_includes_null_and_earlier_types():
+    when = datetime.datetime(2024, 1, 1)
+    assert _after([("d", -1), ("_id", 1)], [when, "k"])["$or"][:3] == [
+        {"d": {"$lt": when}},
+        {"d": None},
+        {"d": {"$type": BEFORE_DATES}},
+    ]
+
+
+def test_descending_after_null_only_continues_within_null():
+    assert _after([("a", -1), ("_id", -1)], [None, 7]) == {"$or": [
+        {"a": None, "_id": {"$lt": 7}},
+        {"a": None, "_id": None},
+    ]}
+
+
+def test_descending_after_a_number_has_no_earlier_type_clause():
+    assert _after([("a", -1)], [5]) == {"$or": [{"a": {"$lt": 5}}, {"a": None}]}
+
+
+@pytest.mark.parametrize("value", [[1, 2], object()])
+def test_unpageable_boundaries_are_rejected(value):
+    with pytest.raises(ValueError):
+        _after([("a", 1), ("_id", 1)], [value, 1])
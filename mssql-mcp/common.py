@@ -1,8 +1,13 @@
 import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
 import pyodbc
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 import logging
+from executor import on_cancel
 
 # Load environment variables
 load_dotenv()
@@ -11,6 +16,17 @@ SQL_SERVER = os.getenv("SQL_SERVER", "localhost")
 SQL_DATABASE = os.getenv("SQL_DATABASE", "mcp_demo")
 SQL_USERNAME = os.getenv("SQL_USERNAME", "mcp_user")
 SQL_PASSWORD = os.getenv("SQL_PASSWORD", "your_password_here")
+# Pool settings
+SQL_POOL_MIN = int(os.getenv("SQL_POOL_MIN", "1"))
+SQL_POOL_MAX = int(os.getenv("SQL_POOL_MAX", "10"))
+SQL_POOL_TIMEOUT = float(os.getenv("SQL_POOL_TIMEOUT", "30"))
+# Idle connections older than this are validated before being handed out
+SQL_POOL_PING_AFTER = float(os.getenv("SQL_POOL_PING_AFTER", "5"))
+# Time budget (ms) for read queries; a call may pass timeout_ms up to the max
+SQL_QUERY_TIMEOUT_MS = int(os.getenv("SQL_QUERY_TIMEOUT_MS", "30000"))
+SQL_MAX_QUERY_TIMEOUT_MS = int(os.getenv("SQL_MAX_QUERY_TIMEOUT_MS", "300000"))
+# Seconds before the schema cache re-checks the catalog for DDL changes
+SQL_SCHEMA_CACHE_TTL = float(os.getenv("SQL_SCHEMA_CACHE_TTL", "60"))
 
 #  Connection string
 conn_str = (
@@ -28,50 +44,274 @@ def get_connection():
     except Exception as e:
         raise RuntimeError(f"Failed to connect to SQL Server: {e}")
 
-def get_cursor():
-    return get_connection().cursor()
+
+class PoolTimeout(Exception):
+    pass
+
+
+def is_disconnect(error: Exception) -> bool:
+    """True when a pyodbc error means the connection itself is unusable.
+
+    Query timeouts (HYT00) and cancels (HY008) leave it usable.
+    """
+    state = error.args[0] if getattr(error, "args", None) else ""
+    if state in ("HYT00", "HY008"):
+        return False
+    if isinstance(error, (pyodbc.OperationalError, pyodbc.InterfaceError)):
+        return True
+    return isinstance(state, str) and state.startswith("08")
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of pyodbc connections.
+
+    Saves the login/TLS handshake per call; broken connections are
+    discarded on return and stale idle ones are validated on checkout.
+    """
+
+    def __init__(self, minconn, maxconn, timeout):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._idle = []          # (conn, returned_at)
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._connect_times = deque(maxlen=1000)
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "connects": 0,
+            "discarded": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+        }
+        for _ in range(minconn):
+            conn = get_connection()
+            self._opened += 1
+            self._count_connect()
+            self._idle.append((conn, time.monotonic()))
+
+    def _count_connect(self):
+        self._stats["connects"] += 1
+        self._connect_times.append(time.monotonic())
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _alive(conn, idle_for):
+        if idle_for < SQL_POOL_PING_AFTER:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1").fetchone()
+            cur.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while not self._idle and self._opened >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"No SQL Server connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+            else:
+                conn, returned_at = None, None
+                self._opened += 1  # reserve the slot while connecting
+
+        if conn is not None and not self._alive(conn, time.monotonic() - returned_at):
+            self._close(conn)
+            with self._cond:
+                self._stats["discarded"] += 1
+            conn = None
+
+        if conn is None:
+            try:
+                conn = get_connection()
+            except Exception:
+                with self._cond:
+                    self._opened -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._count_connect()
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["wait_total"] += waited
+            self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+        return conn
+
+    def putconn(self, conn, close=False):
+        if not close:
+            try:
+                conn.rollback()  # end any implicit transaction left open
+            except pyodbc.Error:
+                close = True
+        if close:
+            self._close(conn)
+        with self._cond:
+            if close:
+                self._opened -= 1
+                self._stats["discarded"] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            recent = sum(1 for t in self._connect_times if now - t <= 60)
+            checkouts = self._stats["checkouts"]
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "open": self._opened,
+                "idle": len(self._idle),
+                "in_use": self._opened - len(self._idle),
+                "checkouts": checkouts,
+                "timeouts": self._stats["timeouts"],
+                "connects": self._stats["connects"],
+                "connects_per_sec": round(recent / 60, 3),
+                "discarded": self._stats["discarded"],
+                "wait_avg_ms": round(self._stats["wait_total"] / checkouts * 1000, 3) if checkouts else 0.0,
+                "wait_max_ms": round(self._stats["wait_max"] * 1000, 3),
+            }
+
 
 try:
-    conn = get_connection()
-    cursor = conn.cursor()
+    pool = ConnectionPool(SQL_POOL_MIN, SQL_POOL_MAX, SQL_POOL_TIMEOUT)
 except Exception as e:
     raise RuntimeError(f"Could not establish default connection: {e}")
 
+
+@contextmanager
+def get_conn():
+    """Check a pooled connection out for the duration of a tool call."""
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except pyodbc.Error as e:
+        broken = is_disconnect(e)
+        raise
+    finally:
+        pool.putconn(conn, close=broken)
+
+
+@contextmanager
+def get_cursor():
+    with get_conn() as conn:
+        cur = conn.cursor()
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+def query_timeout_of(args: dict) -> int:
+    try:
+        timeout = int(args.get("timeout_ms") or SQL_QUERY_TIMEOUT_MS)
+    except (TypeError, ValueError):
+        timeout = SQL_QUERY_TIMEOUT_MS
+    return max(1, min(timeout, SQL_MAX_QUERY_TIMEOUT_MS))
+
+
+@contextmanager
+def query_budget(conn, timeout_ms: int):
+    """Open a cursor bounded by a query timeout, cancelled if the client gives up.
+
+    pyodbc copies conn.timeout into the statement's query timeout only when
+    a cursor is created, so the timeout is set first and the cursor is made
+    here. It is reset afterwards so pooled connections don't keep it.
+    """
+    conn.timeout = max(1, -(-timeout_ms // 1000))  # whole seconds, rounded up
+    try:
+        cursor = conn.cursor()
+        with on_cancel(cursor.cancel):
+            yield cursor
+    finally:
+        conn.timeout = 0
+
 # Initialize FastMCP 
 mcp = FastMCP("MSSQL MCP Server")
 
 #  Table cache 
 tables_cache = []
 schema_cache = {}
+_cache_version = None
+_cache_checked_at = None
+_cache_lock = threading.Lock()
+
+# All user tables and their columns in one round trip
+CATALOG_QUERY = """
+    SELECT t.name, c.name, ty.name
+    FROM sys.tables t
+    JOIN sys.columns c ON c.object_id = t.object_id
+    JOIN sys.types ty ON ty.user_type_id = c.user_type_id
+    WHERE t.is_ms_shipped = 0
+    ORDER BY t.name, c.column_id
+"""
+
+# Any CREATE/ALTER/DROP TABLE moves the count or the latest modify_date
+CATALOG_VERSION_QUERY = """
+    SELECT COUNT(*), MAX(modify_date) FROM sys.tables WHERE is_ms_shipped = 0
+"""
+
+def _load_cache(cur):
+    global tables_cache, schema_cache
+    cur.execute(CATALOG_QUERY)
+    schema = {}
+    for table, column, data_type in cur.fetchall():
+        schema.setdefault(table, []).append({"name": column, "type": data_type})
+    tables_cache = sorted(schema)
+    schema_cache = schema
+
+def _ensure_cache():
+    global _cache_version, _cache_checked_at
+    with _cache_lock:
+        now = time.monotonic()
+        if _cache_checked_at is not None and now - _cache_checked_at < SQL_SCHEMA_CACHE_TTL:
+            return
+        with get_cursor() as cur:
+            cur.execute(CATALOG_VERSION_QUERY)
+            version = tuple(cur.fetchone())
+            if _cache_checked_at is None or version != _cache_version:
+                _load_cache(cur)
+                _cache_version = version
+        _cache_checked_at = now
 
 #  Get all table names
 def get_tables():
-    with get_cursor() as cur:
-        cur.execute("""
-            SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES
-            WHERE TABLE_TYPE = 'BASE TABLE'
-            ORDER BY TABLE_NAME
-        """)
-        return [row[0] for row in cur.fetchall()]
+    _ensure_cache()
+    return list(tables_cache)
 
 #  Get table schema
 def get_table_schema(table_name: str):
-    with get_cursor() as cur:
-        cur.execute("""
-            SELECT COLUMN_NAME, DATA_TYPE
-            FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_NAME = ?
-        """, (table_name,))
-        return [{"name": row[0], "type": row[1]} for row in cur.fetchall()]
+    _ensure_cache()
+    return list(schema_cache.get(table_name, []))
+
+#  Get column names of every table
+def get_database_metadata():
+    _ensure_cache()
+    schema = schema_cache
+    return {table: [col["name"] for col in columns] for table, columns in schema.items()}
 
 #  Refresh caches
 def refresh_cache():
-    global tables_cache, schema_cache
-    tables_cache = get_tables()
-    schema_cache = {}
-    for table in tables_cache:
-        schema_cache[table] = get_table_schema(table)
-
-
-
-
+    global _cache_checked_at
+    with _cache_lock:
+        _cache_checked_at = None
+    _ensure_cache()
+    return {"tables": len(tables_cache)}
@@ -1,6 +1,8 @@
 import pandas as pd
 import pyodbc
 import os
+import json
+import time
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -9,6 +11,9 @@ SERVER = os.getenv("SQL_SERVER", "localhost")
 DATABASE = os.getenv("SQL_DATABASE", "mcp_demo")
 USERNAME = os.getenv("SQL_USERNAME", "mcp_user")
 PASSWORD = os.getenv("SQL_PASSWORD", "your_password_here") 
+# Rows sent per executemany call, and batches merged per commit
+BATCH_SIZE = int(os.getenv("SQL_LOAD_BATCH_SIZE", "10000"))
+COMMIT_EVERY = int(os.getenv("SQL_LOAD_COMMIT_EVERY", "10"))
 
 # Load CSV data
 df = pd.read_csv("data.csv", encoding="ISO-8859-1")
@@ -18,6 +23,7 @@ df.columns = df.columns.str.strip().str.lower()
 
 # Drop rows without customer ID
 df = df.dropna(subset=["customerid"])
+df["customerid"] = df["customerid"].astype(int)
 
 # SQL Server connection string
 conn_str = (
@@ -30,36 +36,78 @@ conn_str = (
 )
 conn = pyodbc.connect(conn_str)
 cursor = conn.cursor()
+cursor.fast_executemany = True
+
+
+def bulk_load(table, key, frame):
+    """Load a frame in batches through a temp staging table and MERGE it in.
+
+    Rows are sent with fast_executemany (one round trip per batch) and
+    merged with WHEN NOT MATCHED, so re-running the loader is idempotent.
+    Work is committed every COMMIT_EVERY batches.
+    """
+    start = time.perf_counter()
+    frame = frame.drop_duplicates(subset=[key])
+    columns = list(frame.columns)
+    column_list = ", ".join(f"[{c}]" for c in columns)
+    stage = f"#{table}_stage"
+
+    # The UNION ALL keeps column types but drops IDENTITY, so explicit keys can be staged
+    cursor.execute(
+        f"SELECT TOP 0 {column_list} INTO {stage} FROM [{table}] "
+        f"UNION ALL SELECT TOP 0 {column_list} FROM [{table}]"
+    )
+    insert_sql = f"INSERT INTO {stage} ({column_list}) VALUES ({', '.join('?' * len(columns))})"
+    merge_sql = (
+        f"MERGE [{table}] WITH (HOLDLOCK) AS t USING {stage} AS s ON t.[{key}] = s.[{key}] "
+        f"WHEN NOT MATCHED THEN INSERT ({column_list}) "
+        f"VALUES ({', '.join(f's.[{c}]' for c in columns)});"
+    )
+
+    inserted = 0
+    rows = frame.astype(object).where(frame.notna(), None).values.tolist()
+    for batch_no, offset in enumerate(range(0, len(rows), BATCH_SIZE), start=1):
+        cursor.executemany(insert_sql, rows[offset:offset + BATCH_SIZE])
+        cursor.execute(merge_sql)
+        inserted += max(cursor.rowcount, 0)
+        cursor.execute(f"TRUNCATE TABLE {stage}")
+        if batch_no % COMMIT_EVERY == 0:
+            conn.commit()
+    conn.commit()
+    cursor.execute(f"DROP TABLE {stage}")
+
+    elapsed = time.perf_counter() - start
+    rate = len(rows) / elapsed if elapsed else 0
+    print(f"  {table}: {len(rows)} rows, {inserted} inserted in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+
 
 # Insert products
 print("Inserting products...")
 products = df[["stockcode", "description", "unitprice"]].drop_duplicates()
 products = products.rename(columns={"stockcode": "code", "description": "name", "unitprice": "price"})
-
-for _, row in products.iterrows():
-    cursor.execute("INSERT INTO products (code, name, price) VALUES (?, ?, ?)", row["code"], row["name"], row["price"])
+bulk_load("products", "code", products)
 
 # Insert users
 print("Inserting users...")
 users = df[["customerid", "country"]].drop_duplicates()
 users = users.rename(columns={"customerid": "user_id"})
-
-for _, row in users.iterrows():
-    cursor.execute("INSERT INTO users (user_id, country) VALUES (?, ?)", row["user_id"], row["country"])
+bulk_load("users", "user_id", users)
 
 # Insert orders
 print("Inserting orders...")
-orders = []
-for invoice, group in df.groupby("invoiceno"):
-    items = group[["stockcode", "quantity"]].to_dict(orient="records")
-    total = (group["quantity"] * group["unitprice"]).sum()
-    customer_id = group["customerid"].iloc[0]
-    orders.append((invoice, customer_id, str(items), total))
+lines = pd.DataFrame({
+    "invoice": df["invoiceno"].astype(str),
+    "customer_id": df["customerid"],
+    "item": [json.dumps({"stockcode": code, "quantity": qty})
+             for code, qty in zip(df["stockcode"].tolist(), df["quantity"].tolist())],
+    "line_total": df["quantity"] * df["unitprice"],
+})
+orders = lines.groupby("invoice", sort=False).agg(
+    customer_id=("customer_id", "first"),
+    items=("item", lambda items: "[" + ", ".join(items) + "]"),
+    total=("line_total", "sum"),
+).reset_index()
+bulk_load("orders", "invoice", orders)
 
-for invoice, customer_id, items, total in orders:
-    cursor.execute("INSERT INTO orders (invoice, customer_id, items, total) VALUES (?, ?, ?, ?)", invoice, customer_id, items, total)
-
-conn.commit()
 conn.close()
 print("Data inserted successfully into SQL Server.")
-
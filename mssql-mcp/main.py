@@ -1,42 +1,72 @@
+import os
+import sys
+
+# Modules used by every server (metrics, executor, serialization) live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
 from mcp.server.fastmcp import FastMCP
-import pandas as pd
+import json
 import logging
-import re
-from common import mcp, conn, get_table_schema, get_tables
+from common import mcp, get_conn, pool, get_table_schema, get_tables, get_database_metadata, refresh_cache
+from common import query_budget, query_timeout_of
+from serialization import to_payload, cursor_columns, format_of, budget_of, fetch_within, row_values, RowShapeError
+from sql_validator import SQLValidator
+from executor import blocking_tool, progress_reporter
+import plans
+import metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("sql_mcp_server")
 
-# --- SQLValidator ---
-class SQLValidator:
-    @staticmethod
-    def is_read_only_query(query: str) -> bool:
-        query = query.strip().upper()
-
-        if not (query.startswith("SELECT") or query.startswith("WITH")):
-            return False
-
-        forbidden = [
-            "INSERT", "UPDATE", "DELETE", "DROP", "ALTER",
-            "TRUNCATE", "MERGE", "REPLACE", "EXEC", "EXECUTE",
-            "GRANT", "REVOKE", ";"
-        ]
-
-        if any(keyword in query for keyword in forbidden):
-            return False
-
-        if re.search(r';\s*\w+', query):
-            return False
+# --- Batch write helpers ---
+STAGE = "#mcp_stage"
+
+def _stage_rows(cursor, table: str, columns: list, rows: list):
+    """Copy the target's column types into a temp table and bulk-load rows into it.
+
+    SELECT INTO copies the IDENTITY property, which would reject explicit
+    key values; through a UNION ALL the columns keep their types but not it.
+    """
+    column_list = ", ".join(f"[{c}]" for c in columns)
+    cursor.execute(f"DROP TABLE IF EXISTS {STAGE}")
+    cursor.execute(
+        f"SELECT TOP 0 {column_list} INTO {STAGE} FROM [{table}] "
+        f"UNION ALL SELECT TOP 0 {column_list} FROM [{table}]"
+    )
+    cursor.fast_executemany = True
+    cursor.executemany(
+        f"INSERT INTO {STAGE} ({column_list}) VALUES ({', '.join(['?'] * len(columns))})",
+        rows,
+    )
+
+# Read within a response budget: fetchmany() stops pulling rows from the
+# server once max_rows/max_bytes is spent, and the statement is cancelled
+def _fetch(cursor, query: str, budget, report) -> tuple:
+    if not budget.limited and not report:
+        return cursor.fetchall(), None
+    on_chunk = None
+    if report:
+        # Each chunk goes out as a progress notification carrying columnar JSON
+        def on_chunk(rows):
+            report(budget.rows, None, json.dumps(to_payload(cursor_columns(cursor), rows)))
+    rows = fetch_within(cursor.fetchmany, budget, on_chunk)
+    if not budget.exhausted:
+        return rows, None
+    cursor.cancel()
+    try:
+        estimated = plans.explain(cursor, query)["plan_rows"]
+    except Exception as e:
+        logger.warning(f"Could not estimate total rows: {e}")
+        estimated = None
+    return rows, budget.marker(estimated)
 
-        return True
 
 # TOOL 1: List all base tables
-@mcp.tool("list_tables", description="List all base tables in the database")
+@blocking_tool(mcp, "list_tables", description="List all base tables in the database")
 def list_tables(data: dict) -> list:
     return get_tables()
 
 # TOOL 2: Get schema of a table
-@mcp.tool("get_table_schema", description="Get column names and types for a specific table")
+@blocking_tool(mcp, "get_table_schema", description="Get column names and types for a specific table")
 def get_table_schema_tool(args: dict) -> list:
     table_name = args.get("table_name")
     if not table_name:
@@ -44,8 +74,8 @@ def get_table_schema_tool(args: dict) -> list:
     return get_table_schema(table_name)
 
 # TOOL 3: Preview first N rows of a table
-@mcp.tool("preview_table", description="Preview first N rows of a specific table")
-def preview_table(args: dict) -> list:
+@blocking_tool(mcp, "preview_table", description="Preview first N rows of a specific table; timeout_ms sets the query time budget, max_rows/max_bytes cap the response and stream=true sends rows as progress notifications")
+def preview_table(args: dict) -> list | dict:
     table_name = args.get("table_name")
     try:
         limit = int(args.get("limit", 10))
@@ -57,40 +87,76 @@ def preview_table(args: dict) -> list:
         if not SQLValidator.is_read_only_query(query):
             return [{"error": "Query is not read-only"}]
 
-        df = pd.read_sql(query, conn)
-        return df.to_dict(orient="records")
+        fmt = format_of(args)
+        budget = budget_of(args)
+        report = progress_reporter() if args.get("stream") else None
+        with get_conn() as conn:
+            with query_budget(conn, query_timeout_of(args)) as cursor, metrics.phase("db"):
+                cursor.execute(query)
+                columns = cursor_columns(cursor)
+                rows, truncated = _fetch(cursor, query, budget, report)
+            with metrics.phase("serialize"):
+                result = to_payload(columns, rows, fmt)
+        if report:
+            result["streamed_rows"] = budget.rows
+        if truncated:
+            result["truncated"] = truncated
+        return result
     except Exception as e:
         logger.error(f"Error previewing table {table_name}: {str(e)}")
         return [{"error": str(e)}]
 
 # TOOL 4: Run custom SELECT query
-@mcp.tool("run_query", description="Execute a custom read-only SQL SELECT query")
-def run_query(args: dict) -> list:
+@blocking_tool(mcp, "run_query", description="Execute a custom read-only SQL SELECT query; timeout_ms sets the query time budget. max_rows/max_bytes stop reading once the response is that large (the result then has a truncated marker with an estimated total), and stream=true sends rows as progress notifications")
+def run_query(args: dict) -> list | dict:
     query = args.get("query", "")
-    if not SQLValidator.is_read_only_query(query):
-        return [{"error": "Only read-only SELECT queries are allowed"}]
+    analysis = SQLValidator.analyze(query)
+    if not analysis.read_only:
+        return [{"error": f"Only read-only SELECT queries are allowed: {analysis.reason}"}]
 
     try:
-        df = pd.read_sql(query, conn)
-        return df.to_dict(orient="records")
+        fmt = format_of(args)
+        budget = budget_of(args)
+        report = progress_reporter() if args.get("stream") else None
+        with get_conn() as conn:
+            with query_budget(conn, query_timeout_of(args)) as cursor, metrics.phase("db"):
+                warning = plans.admit(cursor, query)
+                cursor.execute(query)
+                columns = cursor_columns(cursor)
+                rows, truncated = _fetch(cursor, query, budget, report)
+            with metrics.phase("serialize"):
+                result = to_payload(columns, rows, fmt)
+            if report:
+                result["streamed_rows"] = budget.rows
+            if truncated:
+                result["truncated"] = truncated
+            if warning:
+                result["warning"] = warning
+            return result
+    except plans.CostGuardError as e:
+        return [{"error": str(e)}]
     except Exception as e:
         logger.error(f"Error running query: {str(e)}")
         return [{"error": str(e)}]
 
 # TOOL 5: Database metadata
-@mcp.tool("database_metadata", description="Fetch metadata for all tables and their columns")
+@blocking_tool(mcp, "database_metadata", description="Fetch metadata for all tables and their columns")
 def database_metadata(data: dict) -> dict:
-    metadata = {}
-    for table in get_tables():
-        metadata[table] = [col["name"] for col in get_table_schema(table)]
-    return metadata
+    return get_database_metadata()
+
+# Refresh cached schema after DDL
+@blocking_tool(mcp, "refresh_schema_cache", description="Reload cached table and column metadata, e.g. after DDL changes")
+def refresh_schema_cache(data: dict) -> dict:
+    try:
+        return refresh_cache()
+    except Exception as e:
+        logger.error(f"Schema cache refresh failed: {str(e)}")
+        return {"error": str(e)}
 
 
 # TOOL 6: Insert Row 
-@mcp.tool("insert_row", description="Insert a new row into any table")
+@blocking_tool(mcp, "insert_row", description="Insert a new row into any table")
 def insert_row(args: dict) -> dict:
-    from common import conn
-
     table = args.get("table")
     data = args.get("data")
 
@@ -103,9 +169,10 @@ def insert_row(args: dict) -> dict:
         values = list(data.values())
 
         query = f"INSERT INTO [{table}] ({keys}) VALUES ({placeholders})"
-        cursor = conn.cursor()
-        cursor.execute(query, values)
-        conn.commit()
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, values)
+            conn.commit()
 
         return {"success": True, "inserted_into": table, "data": data}
     except Exception as e:
@@ -115,10 +182,8 @@ def insert_row(args: dict) -> dict:
 
 
 # TOOL 7: Update row 
-@mcp.tool("update_row", description="Update a row in a table by primary key")
+@blocking_tool(mcp, "update_row", description="Update a row in a table by primary key")
 def update_row(args: dict) -> dict:
-    from common import conn
-
     table = args.get("table")
     key_column = args.get("key_column")  # e.g., 'user_id'
     key_value = args.get("key_value")    # e.g., '12345'
@@ -133,9 +198,10 @@ def update_row(args: dict) -> dict:
 
         query = f"UPDATE [{table}] SET {set_clause} WHERE [{key_column}] = ?"
 
-        cursor = conn.cursor()
-        cursor.execute(query, values)
-        conn.commit()
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, values)
+            conn.commit()
 
         return {"success": True, "updated_table": table, "updated_fields": updates}
     except Exception as e:
@@ -145,10 +211,8 @@ def update_row(args: dict) -> dict:
 
 
 # TOOL 8 : Delete row
-@mcp.tool("delete_row", description="Delete a row from a table by primary key")
+@blocking_tool(mcp, "delete_row", description="Delete a row from a table by primary key")
 def delete_row(args: dict) -> dict:
-    from common import conn
-
     table = args.get("table")
     key_column = args.get("key_column")
     key_value = args.get("key_value")
@@ -158,9 +222,10 @@ def delete_row(args: dict) -> dict:
 
     try:
         query = f"DELETE FROM [{table}] WHERE [{key_column}] = ?"
-        cursor = conn.cursor()
-        cursor.execute(query, [key_value])
-        conn.commit()
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, [key_value])
+            conn.commit()
 
         return {
             "success": True,
@@ -171,7 +236,165 @@ def delete_row(args: dict) -> dict:
         logger.error(f"Delete failed: {str(e)}")
         return {"error": str(e)}
 
+# TOOL 9: Insert many rows
+@blocking_tool(mcp, "insert_rows", description="Insert many rows in one transaction; pass key_columns to upsert with MERGE", limit=2)
+def insert_rows(args: dict) -> dict:
+    table = args.get("table")
+    rows = args.get("rows")
+    key_columns = args.get("key_columns") or []
+
+    if not table or not isinstance(rows, list) or not rows or not all(isinstance(r, dict) for r in rows):
+        return {"error": "Missing or invalid 'table' or 'rows'"}
+
+    columns = list(rows[0].keys())
+    if any(k not in columns for k in key_columns):
+        return {"error": "Every key column must be present in the rows"}
+    try:
+        # A missing key would stage NULL, which MERGE then writes over the stored value
+        values = row_values(rows, columns)
+    except RowShapeError as e:
+        return {"error": str(e), "rows": e.rows}
+    column_list = ", ".join(f"[{c}]" for c in columns)
+
+    try:
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            if not key_columns:
+                cursor.fast_executemany = True
+                cursor.executemany(
+                    f"INSERT INTO [{table}] ({column_list}) VALUES ({', '.join(['?'] * len(columns))})",
+                    values,
+                )
+                conn.commit()
+                return {"success": True, "table": table, "inserted": len(values), "updated": 0}
+
+            _stage_rows(cursor, table, columns, values)
+            on = " AND ".join(f"t.[{k}] = s.[{k}]" for k in key_columns)
+            updates = [c for c in columns if c not in key_columns]
+            matched = (
+                "WHEN MATCHED THEN UPDATE SET " + ", ".join(f"t.[{c}] = s.[{c}]" for c in updates) + " "
+                if updates else ""
+            )
+            cursor.execute(
+                f"MERGE [{table}] WITH (HOLDLOCK) AS t USING {STAGE} AS s ON {on} "
+                f"{matched}"
+                f"WHEN NOT MATCHED THEN INSERT ({column_list}) VALUES ({', '.join(f's.[{c}]' for c in columns)}) "
+                f"OUTPUT $action;"
+            )
+            actions = [row[0] for row in cursor.fetchall()]
+            cursor.execute(f"DROP TABLE {STAGE}")
+            conn.commit()
+
+        return {
+            "success": True,
+            "table": table,
+            "inserted": actions.count("INSERT"),
+            "updated": actions.count("UPDATE"),
+        }
+    except Exception as e:
+        logger.error(f"Bulk insert failed: {str(e)}")
+        return {"error": str(e)}
+
+# TOOL 10: Update many rows by key
+@blocking_tool(mcp, "update_rows", description="Update many rows by key in one set-based UPDATE", limit=2)
+def update_rows(args: dict) -> dict:
+    table = args.get("table")
+    key_column = args.get("key_column")
+    rows = args.get("rows")  # e.g. [{"user_id": 1, "country": "France"}, ...]
+
+    if not table or not key_column or not isinstance(rows, list) or not rows \
+            or not all(isinstance(r, dict) and key_column in r for r in rows):
+        return {"error": "Missing or invalid 'table', 'key_column', or 'rows' (each row needs the key column)"}
+
+    columns = list(rows[0].keys())
+    updates = [c for c in columns if c != key_column]
+    if not updates:
+        return {"error": "Rows contain no columns to update"}
+    try:
+        values = row_values(rows, columns)
+    except RowShapeError as e:
+        return {"error": str(e), "rows": e.rows}
+
+    try:
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            _stage_rows(cursor, table, columns, values)
+            set_clause = ", ".join(f"t.[{c}] = s.[{c}]" for c in updates)
+            cursor.execute(
+                f"UPDATE t SET {set_clause} FROM [{table}] AS t "
+                f"JOIN {STAGE} AS s ON t.[{key_column}] = s.[{key_column}]"
+            )
+            updated = cursor.rowcount
+            cursor.execute(f"DROP TABLE {STAGE}")
+            conn.commit()
+
+        return {"success": True, "updated_table": table, "updated": updated}
+    except Exception as e:
+        logger.error(f"Bulk update failed: {str(e)}")
+        return {"error": str(e)}
+
+# TOOL 11: Delete many rows by key
+@blocking_tool(mcp, "delete_rows", description="Delete many rows by key in one set-based DELETE", limit=2)
+def delete_rows(args: dict) -> dict:
+    table = args.get("table")
+    key_column = args.get("key_column")
+    key_values = args.get("key_values")
+
+    if not table or not key_column or not isinstance(key_values, list) or not key_values:
+        return {"error": "Missing or invalid 'table', 'key_column', or 'key_values'"}
+
+    try:
+        with get_conn() as conn:
+            cursor = conn.cursor()
+            _stage_rows(cursor, table, [key_column], [[v] for v in key_values])
+            cursor.execute(
+                f"DELETE t FROM [{table}] AS t "
+                f"JOIN {STAGE} AS s ON t.[{key_column}] = s.[{key_column}]"
+            )
+            deleted = cursor.rowcount
+            cursor.execute(f"DROP TABLE {STAGE}")
+            conn.commit()
+
+        return {"success": True, "deleted_from": table, "deleted": deleted}
+    except Exception as e:
+        logger.error(f"Bulk delete failed: {str(e)}")
+        return {"error": str(e)}
+
+# TOOL 12: Estimated plan
+@blocking_tool(mcp, "explain", description="Show the estimated plan (SHOWPLAN_XML) of a read-only query with its total cost, row estimate and operators, without running it")
+def explain(args: dict) -> dict:
+    query = args.get("query", "")
+    analysis = SQLValidator.analyze(query)
+    if not analysis.read_only:
+        return {"error": f"Only read-only SELECT queries can be explained: {analysis.reason}"}
+
+    try:
+        with get_conn() as conn:
+            with query_budget(conn, query_timeout_of(args)) as cursor:
+                estimate = plans.explain(cursor, query)
+        try:
+            estimate["guard"] = plans.check(estimate)
+        except plans.CostGuardError as e:
+            estimate["guard"] = str(e)
+        return estimate
+    except Exception as e:
+        logger.error(f"Error explaining query: {str(e)}")
+        return {"error": str(e)}
+
+# TOOL 13: Connection pool stats
+@blocking_tool(mcp, "pool_stats", description="Get connection pool usage, wait-time and connect-rate statistics")
+def pool_stats(data: dict) -> dict:
+    return pool.stats()
+
+# TOOL 14: Tool metrics
+@blocking_tool(mcp, "metrics", description="Get per-tool call counts, errors, latency percentiles, DB and serialization time, rows and bytes returned. format=prometheus returns Prometheus text in 'text'")
+def metrics_tool(data: dict) -> dict:
+    if data.get("format") == "prometheus":
+        return {"format": "prometheus", "text": metrics.prometheus_text()}
+    return metrics.snapshot()
+
 # Run the MCP server
 if __name__ == "__main__":
+    metrics.start_exporters()
     mcp.run(transport="stdio")
 
@@ -0,0 +1,70 @@
+import os
+import xml.etree.ElementTree as ET
+
+# Admission guard on optimizer estimates for run_query; 0 disables a check
+SQL_MAX_QUERY_COST = float(os.getenv("SQL_MAX_QUERY_COST", "0"))
+SQL_MAX_QUERY_ROWS = float(os.getenv("SQL_MAX_QUERY_ROWS", "0"))
+# "reject" refuses queries over a threshold, "warn" runs them with a warning
+SQL_COST_GUARD_MODE = os.getenv("SQL_COST_GUARD_MODE", "reject")
+
+SHOWPLAN_NS = {"sp": "http://schemas.microsoft.com/sqlserver/2004/07/showplan"}
+# Operators listed in the explain summary
+MAX_PLAN_OPERATORS = 50
+
+
+class CostGuardError(Exception):
+    pass
+
+
+def explain(cursor, query: str) -> dict:
+    """Estimated plan of a query from SHOWPLAN_XML; the query is not executed."""
+    cursor.execute("SET SHOWPLAN_XML ON")
+    try:
+        cursor.execute(query)
+        plan_xml = "".join(row[0] for row in cursor.fetchall())
+    finally:
+        # The setting is per connection; never hand a pooled connection back with it on
+        cursor.execute("SET SHOWPLAN_XML OFF")
+
+    root = ET.fromstring(plan_xml)
+    statements = root.findall(".//sp:StmtSimple", SHOWPLAN_NS)
+    operators = [
+        {
+            "operator": op.get("PhysicalOp"),
+            "estimated_rows": float(op.get("EstimateRows", 0)),
+            "estimated_cost": float(op.get("EstimatedTotalSubtreeCost", 0)),
+        }
+        for op in root.iterfind(".//sp:RelOp", SHOWPLAN_NS)
+    ]
+    return {
+        "total_cost": sum(float(s.get("StatementSubTreeCost", 0)) for s in statements),
+        "plan_rows": max((float(s.get("StatementEstRows", 0)) for s in statements), default=0.0),
+        "operators": operators[:MAX_PLAN_OPERATORS],
+        "plan_xml": plan_xml,
+    }
+
+
+def check(estimate: dict):
+    """Apply the thresholds to an estimate.
+
+    Returns None when the query is within budget, a warning in "warn"
+    mode, and raises CostGuardError in "reject" mode.
+    """
+    problems = []
+    if SQL_MAX_QUERY_COST and estimate["total_cost"] > SQL_MAX_QUERY_COST:
+        problems.append(f"estimated cost {estimate['total_cost']:.2f} exceeds {SQL_MAX_QUERY_COST:.2f}")
+    if SQL_MAX_QUERY_ROWS and estimate["plan_rows"] > SQL_MAX_QUERY_ROWS:
+        problems.append(f"estimated rows {estimate['plan_rows']:.0f} exceed {SQL_MAX_QUERY_ROWS:.0f}")
+    if not problems:
+        return None
+    message = "Query " + " and ".join(problems)
+    if SQL_COST_GUARD_MODE == "warn":
+        return message
+    raise CostGuardError(f"{message}; narrow it or inspect it with the explain tool")
+
+
+def admit(cursor, query: str):
+    """Plan the query and apply the guard, if any threshold is configured."""
+    if not (SQL_MAX_QUERY_COST or SQL_MAX_QUERY_ROWS):
+        return None
+    return check(explain(cursor, query))
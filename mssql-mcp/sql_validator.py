@@ -0,0 +1,126 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Validated queries remembered by exact text, so a repeated query is not tokenized again
+SQL_VALIDATOR_CACHE_SIZE = int(os.getenv("SQL_VALIDATOR_CACHE_SIZE", "1024"))
+
+# Statements or keywords that can change data, schema or server state
+FORBIDDEN = frozenset({
+    "INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "TRUNCATE",
+    "MERGE", "EXEC", "EXECUTE", "GRANT", "REVOKE", "DENY", "INTO",
+    "BULK", "BACKUP", "RESTORE", "DBCC", "KILL", "SHUTDOWN", "RECONFIGURE",
+    "USE", "DECLARE", "SET", "OPENROWSET", "OPENQUERY", "OPENDATASOURCE",
+    "WAITFOR", "UPDATETEXT", "WRITETEXT", "READTEXT",
+})
+
+_TOKEN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*)
+  | (?P<block>/\*)
+  | (?P<string>N?'(?:[^']|'')*')
+  | (?P<bracket>\[(?:[^\]]|\]\])*\])
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>0[xX][0-9A-Fa-f]*|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_@#][\w@#$]*)
+  | (?P<semi>;)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+
+class Analysis:
+    __slots__ = ("read_only", "reason")
+
+    def __init__(self, read_only, reason=None):
+        self.read_only = read_only
+        self.reason = reason
+
+
+def _skip_block_comment(query: str, pos: int) -> int:
+    """Return the index after a (possibly nested) /* ... */ comment, or -1."""
+    depth = 1
+    while depth:
+        close = query.find("*/", pos)
+        if close < 0:
+            return -1
+        opened = query.find("/*", pos, close)
+        if opened >= 0:
+            depth += 1
+            pos = opened + 2
+        else:
+            depth -= 1
+            pos = close + 2
+    return pos
+
+
+def tokenize(query: str):
+    """Single pass over the query.
+
+    Returns (words, parts, semicolon positions, error). Words are upper-cased
+    keywords and identifiers found outside literals, comments and quoted
+    identifiers; parts are all tokens, with literals replaced by '?'.
+    """
+    words, parts, semis = [], [], []
+    pos, length = 0, len(query)
+    while pos < length:
+        match = _TOKEN.match(query, pos)
+        kind, text = match.lastgroup, match.group()
+        pos = match.end()
+        if kind in ("ws", "comment"):
+            continue
+        if kind == "block":
+            pos = _skip_block_comment(query, pos)
+            if pos < 0:
+                return words, parts, semis, "Unterminated comment"
+            continue
+        if kind == "other" and text in ("'", "[", '"'):
+            return words, parts, semis, "Unterminated literal or identifier"
+        if kind in ("string", "number"):
+            parts.append("?")
+        elif kind == "word":
+            word = text.upper()
+            words.append(word)
+            parts.append(word)
+        else:
+            if kind == "semi":
+                semis.append(len(parts))
+            parts.append(text)
+    return words, parts, semis, None
+
+
+class SQLValidator:
+    _cache = OrderedDict()   # query text -> Analysis
+    _lock = threading.Lock()
+
+    @classmethod
+    def analyze(cls, query: str) -> Analysis:
+        with cls._lock:
+            cached = cls._cache.get(query)
+            if cached is not None:
+                cls._cache.move_to_end(query)
+                return cached
+
+        words, parts, semis, error = tokenize(query)
+        analysis = Analysis(False, error) if error else cls._classify(words, parts, semis)
+        with cls._lock:
+            cls._cache[query] = analysis
+            while len(cls._cache) > SQL_VALIDATOR_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return analysis
+
+    @staticmethod
+    def _classify(words, parts, semis) -> Analysis:
+        if not words or words[0] not in ("SELECT", "WITH"):
+            return Analysis(False, "Query must start with SELECT or WITH")
+        if semis and (len(semis) > 1 or semis[0] != len(parts) - 1):
+            return Analysis(False, "Multiple statements are not allowed")
+        for word in words:
+            if word in FORBIDDEN:
+                return Analysis(False, f"'{word}' is not allowed in a read-only query")
+        return Analysis(True)
+
+    @classmethod
+    def is_read_only_query(cls, query: str) -> bool:
+        return cls.analyze(query).read_only
+
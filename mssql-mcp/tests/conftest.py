@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Server modules use flat imports from the server directory and ../shared
+SERVER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [SERVER, os.path.join(SERVER, "..", "shared")]
@@ -0,0 +1,74 @@
+import pytest
+
+import sql_validator
+from sql_validator import SQLValidator, tokenize
+
+
+def test_keywords_inside_literals_and_comments_are_not_words():
+    words, parts, semis, error = tokenize(
+        "SELECT 'DROP TABLE x' AS a, N'DELETE' -- INSERT\n/* UPDATE /* nested EXEC */ */ FROM t"
+    )
+    assert error is None
+    assert words == ["SELECT", "AS", "A", "FROM", "T"]
+    assert parts == ["SELECT", "?", "AS", "A", ",", "?", "FROM", "T"]
+    assert semis == []
+
+
+def test_quoted_and_bracketed_identifiers_are_not_words():
+    words, _, _, error = tokenize('SELECT [drop], "delete", [a]]b] FROM [insert]')
+    assert error is None
+    assert words == ["SELECT", "FROM"]
+
+
+def test_escaped_quotes_stay_inside_the_literal():
+    words, parts, _, error = tokenize("SELECT 'it''s; DROP' FROM t")
+    assert error is None
+    assert words == ["SELECT", "FROM", "T"]
+    assert parts == ["SELECT", "?", "FROM", "T"]
+
+
+@pytest.mark.parametrize("query, error", [
+    ("SELECT 'open", "Unterminated literal or identifier"),
+    ("SELECT [open", "Unterminated literal or identifier"),
+    ("SELECT 1 /* open /* nested */", "Unterminated comment"),
+])
+def test_unterminated_tokens(query, error):
+    assert tokenize(query)[3] == error
+    assert SQLValidator.analyze(query).reason == error
+
+
+def test_repeated_query_is_not_tokenized_again(monkeypatch):
+    calls = []
+    monkeypatch.setattr(sql_validator, "tokenize", lambda q: calls.append(q) or tokenize(q))
+    query = "SELECT a FROM t WHERE b = 'repeat me'"
+    first = SQLValidator.analyze(query)
+    assert SQLValidator.analyze(query) is first
+    assert calls == [query]
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT 1",
+    "SELECT 1;",
+    "WITH c AS (SELECT 1 AS a) SELECT a FROM c",
+    "SELECT 'DELETE FROM t; DROP TABLE t' FROM t",
+    "SELECT [update] FROM t -- ; DROP TABLE t",
+])
+def test_read_only(query):
+    analysis = SQLValidator.analyze(query)
+    assert analysis.read_only, analysis.reason
+
+
+@pytest.mark.parametrize("query, reason", [
+    ("SELECT 1; SELECT 2", "Multiple statements are not allowed"),
+    ("SELECT 1; DROP TABLE t", "Multiple statements are not allowed"),
+    ("SELECT 1;;", "Multiple statements are not allowed"),
+    ("SELECT * INTO copy FROM t", "'INTO' is not allowed in a read-only query"),
+    ("WITH c AS (SELECT 1) DELETE FROM t", "'DELETE' is not allowed in a read-only query"),
+    ("EXEC sp_who", "Query must start with SELECT or WITH"),
+    ("/* SELECT */ UPDATE t SET a = 1", "Query must start with SELECT or WITH"),
+    ("", "Query must start with SELECT or WITH"),
+])
+def test_rejected(query, reason):
+    analysis = SQLValidator.analyze(query)
+    assert not analysis.read_only
+    assert analysis.reason == reason
@@ -1,5 +1,10 @@
 import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 import psycopg2
+import psycopg2.extensions
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 
@@ -12,78 +17,417 @@ PG_DB = os.getenv("PG_DB", "mcp_postgres")
 PG_USER = os.getenv("PG_USER", "mcp_user")
 PG_PASSWORD = os.getenv("PG_PASSWORD", "")
 
-# Connect to PostgreSQL
-try:
-    conn = psycopg2.connect(
+# Pool settings
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "30"))
+# Idle connections older than this are pinged before being handed out
+PG_POOL_PING_AFTER = float(os.getenv("PG_POOL_PING_AFTER", "5"))
+# Time budget (ms) for read statements; a call may pass timeout_ms up to the max
+PG_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_STATEMENT_TIMEOUT_MS", "30000"))
+PG_MAX_STATEMENT_TIMEOUT_MS = int(os.getenv("PG_MAX_STATEMENT_TIMEOUT_MS", "300000"))
+
+
+class Connection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers its server-side prepared statements."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = OrderedDict()   # normalized sql -> (statement name, parameter order)
+
+
+def connect():
+    return psycopg2.connect(
         host=PG_HOST,
         port=PG_PORT,
         dbname=PG_DB,
         user=PG_USER,
-        password=PG_PASSWORD
+        password=PG_PASSWORD,
+        connection_factory=Connection
     )
-    cursor = conn.cursor()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    Connections are health-checked on checkout and replaced when broken,
+    so the pool recovers by itself after a server restart.
+    """
+
+    def __init__(self, minconn, maxconn, timeout):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._idle = []          # (conn, returned_at)
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "connects": 0,
+            "discarded": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+        }
+        for _ in range(minconn):
+            self._idle.append((self._open(), time.monotonic()))
+
+    def _open(self):
+        conn = connect()
+        self._opened += 1
+        self._stats["connects"] += 1
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _healthy(conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < PG_POOL_PING_AFTER:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while not self._idle and self._opened >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"No PostgreSQL connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+            else:
+                conn, returned_at = None, None
+                self._opened += 1  # reserve the slot while connecting
+
+        if conn is not None and not self._healthy(conn, time.monotonic() - returned_at):
+            # Dead connection (e.g. server restart): reconnect in the same slot
+            self._close(conn)
+            with self._cond:
+                self._stats["discarded"] += 1
+            conn = None
+
+        if conn is None:
+            try:
+                conn = connect()
+            except Exception:
+                with self._cond:
+                    self._opened -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["connects"] += 1
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._stats["checkouts"] += 1
+            self._stats["wait_total"] += waited
+            self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+        return conn
+
+    def putconn(self, conn, close=False):
+        if not close and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+        if close or conn.closed:
+            self._close(conn)
+        with self._cond:
+            if close or conn.closed:
+                self._opened -= 1
+                self._stats["discarded"] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            checkouts = self._stats["checkouts"]
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "open": self._opened,
+                "idle": len(self._idle),
+                "in_use": self._opened - len(self._idle),
+                "checkouts": checkouts,
+                "timeouts": self._stats["timeouts"],
+                "connects": self._stats["connects"],
+                "discarded": self._stats["discarded"],
+                "wait_avg_ms": round(self._stats["wait_total"] / checkouts * 1000, 3) if checkouts else 0.0,
+                "wait_max_ms": round(self._stats["wait_max"] * 1000, 3),
+            }
+
+
+# Connect to PostgreSQL
+try:
+    pool = ConnectionPool(PG_POOL_MIN, PG_POOL_MAX, PG_POOL_TIMEOUT)
 except Exception as e:
     raise RuntimeError(f"Could not connect to PostgreSQL: {e}")
 
+
+def is_disconnect(error: Exception) -> bool:
+    """True when an error means the connection itself is unusable.
+
+    A cancelled or timed-out statement only aborts the transaction; the
+    rollback on return leaves the connection clean.
+    """
+    if isinstance(error, psycopg2.errors.QueryCanceled):
+        return False
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+def statement_timeout_of(args: dict) -> int:
+    try:
+        timeout = int(args.get("timeout_ms") or PG_STATEMENT_TIMEOUT_MS)
+    except (TypeError, ValueError):
+        timeout = PG_STATEMENT_TIMEOUT_MS
+    return max(1, min(timeout, PG_MAX_STATEMENT_TIMEOUT_MS))
+
+
+def set_statement_timeout(cursor, timeout_ms: int):
+    """Bound every statement for the rest of the transaction; rollback resets it."""
+    cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+
+
+@contextmanager
+def get_conn():
+    """Check a connection out of the pool for the duration of a tool call."""
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except psycopg2.Error as e:
+        broken = is_disconnect(e)
+        raise
+    finally:
+        pool.putconn(conn, close=broken)
+
+
 # MCP instance
 mcp = FastMCP("PostgreSQL MCP Server")
 
+# Catalog settings
+# How often (seconds) to check whether the cached schema is still current
+PG_CATALOG_CHECK_INTERVAL = float(os.getenv("PG_CATALOG_CHECK_INTERVAL", "5"))
+
+# Whole public schema in one round trip: columns, primary keys and indexes
+# of every table
+CATALOG_QUERY = """
+    SELECT
+        c.relname,
+        (SELECT json_agg(json_build_object(
+                    'name', a.attname,
+                    'type', format_type(a.atttypid, a.atttypmod),
+                    'nullable', CASE WHEN a.attnotnull THEN 'NO' ELSE 'YES' END,
+                    'default', pg_get_expr(d.adbin, d.adrelid)
+                ) ORDER BY a.attnum)
+         FROM pg_attribute a
+         LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+         WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped),
+        (SELECT json_agg(a.attname ORDER BY array_position(i.indkey::int2[], a.attnum))
+         FROM pg_index i
+         JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+         WHERE i.indrelid = c.oid AND i.indisprimary),
+        (SELECT json_agg(json_build_object(
+                    'name', ic.relname,
+                    'unique', i.indisunique,
+                    'definition', pg_get_indexdef(i.indexrelid)
+                ) ORDER BY ic.relname)
+         FROM pg_index i
+         JOIN pg_class ic ON ic.oid = i.indexrelid
+         WHERE i.indrelid = c.oid)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
+    ORDER BY c.relname
+"""
+
+# Cheap change detector: any DDL on a table, column or index rewrites its
+# catalog row (new xmin), and drops change the row counts
+CATALOG_VERSION_QUERY = """
+    SELECT
+        (SELECT count(*) || ':' || coalesce(max(c.xmin::text::bigint), 0)
+         FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+         WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p', 'i')),
+        (SELECT count(*) || ':' || coalesce(max(a.xmin::text::bigint), 0)
+         FROM pg_attribute a
+         JOIN pg_class c ON c.oid = a.attrelid
+         JOIN pg_namespace n ON n.oid = c.relnamespace
+         WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p') AND a.attnum > 0)
+"""
+
+# Planner row and page estimates of every table. ANALYZE and autovacuum
+# update them in place without changing the catalog version, so they are
+# re-read on every check instead of being kept with the schema
+SIZES_QUERY = """
+    SELECT c.relname, c.reltuples::bigint, c.relpages
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
+"""
+
+
+# Planner statistics and on-disk sizes for one table; all catalog reads,
+# no table scan
+TABLE_STATS_QUERY = """
+    SELECT
+        c.reltuples::bigint,
+        c.relpages,
+        pg_relation_size(c.oid),
+        pg_indexes_size(c.oid),
+        pg_total_relation_size(c.oid),
+        s.n_live_tup,
+        s.n_dead_tup,
+        greatest(s.last_analyze, s.last_autoanalyze),
+        (SELECT json_object_agg(ic.relname, pg_relation_size(ic.oid))
+         FROM pg_index i JOIN pg_class ic ON ic.oid = i.indexrelid
+         WHERE i.indrelid = c.oid)
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE n.nspname = 'public' AND c.relname = %s AND c.relkind IN ('r', 'p')
+"""
+
+COLUMN_STATS_QUERY = """
+    SELECT
+        attname,
+        null_frac,
+        n_distinct,
+        avg_width,
+        (most_common_vals::text::text[])[1:%s],
+        most_common_freqs[1:%s],
+        correlation
+    FROM pg_stats
+    WHERE schemaname = 'public' AND tablename = %s
+"""
+
+class SchemaCatalog:
+    """In-process cache of the public schema.
+
+    The full catalog is loaded with a single query and only reloaded when
+    the catalog version changes, checked at most every
+    PG_CATALOG_CHECK_INTERVAL seconds. Row and page estimates are refreshed
+    on every check.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._tables = None
+        self._structure = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._tables = self._structure = None
+
+    def tables(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            if self._tables is not None and now - self._checked_at < self.check_interval:
+                return self._tables
+
+            with get_conn() as conn, conn.cursor() as cursor:
+                cursor.execute(CATALOG_VERSION_QUERY)
+                version = cursor.fetchone()
+                if self._structure is None or version != self._version:
+                    cursor.execute(CATALOG_QUERY)
+                    self._structure = {
+                        name: {
+                            "columns": columns or [],
+                            "primary_key": primary_key or [],
+                            "indexes": indexes or [],
+                        }
+                        for name, columns, primary_key, indexes in cursor.fetchall()
+                    }
+                    self._version = version
+                cursor.execute(SIZES_QUERY)
+                sizes = {name: (rows, pages) for name, rows, pages in cursor.fetchall()}
+                conn.rollback()
+            tables = {}
+            for name, structure in self._structure.items():
+                rows, pages = sizes.get(name, (-1, 0))
+                tables[name] = {"estimated_rows": rows if rows >= 0 else None, "pages": pages, **structure}
+            self._tables = tables
+            self._checked_at = now
+            return self._tables
+
+
+catalog = SchemaCatalog(PG_CATALOG_CHECK_INTERVAL)
+
 # Get list of tables
 def get_tables():
-    cursor.execute("""
-        SELECT table_name
-        FROM information_schema.tables
-        WHERE table_schema = 'public'
-        AND table_type = 'BASE TABLE'
-        ORDER BY table_name
-    """)
-    return [row[0] for row in cursor.fetchall()]
+    return list(catalog.tables())
 
 # Get schema of a table
 def get_table_schema(table_name: str):
-    cursor.execute("""
-        SELECT column_name, data_type
-        FROM information_schema.columns
-        WHERE table_name = %s
-    """, (table_name,))
-    return [{"name": row[0], "type": row[1]} for row in cursor.fetchall()]
-
-# get metadata of a table 
-def get_database_metadata():
-    cursor.execute("""
-        SELECT table_name 
-        FROM information_schema.tables 
-        WHERE table_schema = 'public' AND table_type = 'BASE TABLE'
-    """)
-    tables = [row[0] for row in cursor.fetchall()]
-    metadata = []
-
-    for table in tables:
-        cursor.execute("""
-            SELECT 
-                column_name, 
-                data_type, 
-                is_nullable, 
-                column_default
-            FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = %s
-        """, (table,))
-        columns = cursor.fetchall()
-
-        metadata.append({
-            "table_name": table,
-            "columns": [
-                {
-                    "name": col[0],
-                    "type": col[1],
-                    "nullable": col[2],
-                    "default": col[3]
-                }
-                for col in columns
-            ]
-        })
-
-    return metadata
-
+    table = catalog.tables().get(table_name)
+    if table is None:
+        return []
+    return [{"name": col["name"], "type": col["type"]} for col in table["columns"]]
 
+# Row estimate, sizes and per-column statistics of a table
+def get_table_stats(table_name: str, mcv_limit: int = 10):
+    with get_conn() as conn, conn.cursor() as cursor:
+        cursor.execute(TABLE_STATS_QUERY, (table_name,))
+        row = cursor.fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        rows, pages, table_bytes, index_bytes, total_bytes, live, dead, analyzed, index_sizes = row
+        cursor.execute(COLUMN_STATS_QUERY, (mcv_limit, mcv_limit, table_name))
+        columns = {
+            name: {
+                "null_frac": null_frac,
+                # Negative n_distinct is a fraction of the row count
+                "n_distinct": n_distinct,
+                "avg_width": avg_width,
+                "most_common_vals": values,
+                "most_common_freqs": freqs,
+                "correlation": correlation,
+            }
+            for name, null_frac, n_distinct, avg_width, values, freqs, correlation in cursor.fetchall()
+        }
+        conn.rollback()
+    return {
+        "table_name": table_name,
+        "estimated_rows": rows if rows >= 0 else None,
+        "pages": pages,
+        "table_bytes": table_bytes,
+        "index_bytes": index_bytes,
+        "total_bytes": total_bytes,
+        "index_sizes": index_sizes or {},
+        "live_tuples": live,
+        "dead_tuples": dead,
+        "last_analyzed": analyzed.isoformat() if analyzed else None,
+        "columns": columns,
+    }
 
+# get metadata of all tables
+def get_database_metadata():
+    return [
+        {"table_name": name, **table}
+        for name, table in catalog.tables().items()
+    ]
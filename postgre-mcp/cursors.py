@@ -0,0 +1,156 @@
+import os
+import time
+import uuid
+import threading
+import psycopg2
+from common import pool, is_disconnect, set_statement_timeout, PG_STATEMENT_TIMEOUT_MS
+from executor import on_cancel
+import metrics
+from serialization import to_payload
+
+# Paging settings
+PG_PAGE_SIZE = int(os.getenv("PG_PAGE_SIZE", "500"))
+PG_MAX_PAGE_SIZE = int(os.getenv("PG_MAX_PAGE_SIZE", "10000"))
+# Open cursors hold a pooled connection, so they expire when left unread
+PG_CURSOR_TTL = float(os.getenv("PG_CURSOR_TTL", "300"))
+PG_MAX_OPEN_CURSORS = int(os.getenv("PG_MAX_OPEN_CURSORS", "4"))
+
+
+class CursorError(Exception):
+    pass
+
+
+class _CursorSession:
+    def __init__(self, conn, cursor):
+        self.conn = conn
+        self.cursor = cursor
+        self.lock = threading.Lock()
+        self.touched = time.monotonic()
+        self.rows_sent = 0
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _release(session, broken=False):
+    try:
+        session.cursor.close()
+    except psycopg2.Error as e:
+        broken = broken or is_disconnect(e)
+    pool.putconn(session.conn, close=broken)
+
+
+def _expire_sessions():
+    now = time.monotonic()
+    with _sessions_lock:
+        expired = [t for t, s in _sessions.items() if now - s.touched > PG_CURSOR_TTL]
+        sessions = [_sessions.pop(t) for t in expired]
+    for session in sessions:
+        with session.lock:
+            _release(session)
+
+
+def page_size_of(args: dict) -> int:
+    try:
+        size = int(args.get("page_size") or PG_PAGE_SIZE)
+    except (TypeError, ValueError):
+        size = PG_PAGE_SIZE
+    return max(1, min(size, PG_MAX_PAGE_SIZE))
+
+
+def _fetch_page(token, session, page_size, fmt):
+    with on_cancel(session.conn.cancel), metrics.phase("db"):
+        rows = session.cursor.fetchmany(page_size)
+    session.rows_sent += len(rows)
+    session.touched = time.monotonic()
+    columns = [col.name for col in session.cursor.description]
+    done = len(rows) < page_size
+    with metrics.phase("serialize"):
+        page = to_payload(columns, rows, fmt)
+    page["rows_sent"] = session.rows_sent
+    page["next_token"] = None if done else token
+    return page, done
+
+
+def open_cursor(query: str, params=None, page_size: int = PG_PAGE_SIZE, fmt: str = "columnar",
+                timeout_ms: int = PG_STATEMENT_TIMEOUT_MS) -> dict:
+    """Run a query on a named server-side cursor and return its first page.
+
+    Only one page is held in memory; when more rows remain the result
+    carries a next_token that fetch_page() resumes from. timeout_ms bounds
+    each statement, including the FETCH behind every later page.
+    """
+    _expire_sessions()
+    with _sessions_lock:
+        if len(_sessions) >= PG_MAX_OPEN_CURSORS:
+            raise CursorError(
+                f"Too many open cursors ({PG_MAX_OPEN_CURSORS}); "
+                "finish or close one with close_cursor first"
+            )
+
+    token = uuid.uuid4().hex
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            set_statement_timeout(cur, timeout_ms)
+        cursor = conn.cursor(name=f"mcp_{token}")
+        cursor.itersize = page_size
+        with on_cancel(conn.cancel):
+            cursor.execute(query, params)
+    except Exception as e:
+        pool.putconn(conn, close=is_disconnect(e))
+        raise
+
+    session = _CursorSession(conn, cursor)
+    with session.lock:
+        try:
+            page, done = _fetch_page(token, session, page_size, fmt)
+        except Exception:
+            _release(session)
+            raise
+        if done:
+            _release(session)
+        else:
+            with _sessions_lock:
+                _sessions[token] = session
+    return page
+
+
+def fetch_page(token: str, page_size: int = PG_PAGE_SIZE, fmt: str = "columnar", timeout_ms: int = None) -> dict:
+    """Fetch the next page of a cursor opened by open_cursor()."""
+    _expire_sessions()
+    with _sessions_lock:
+        session = _sessions.get(token)
+    if session is None:
+        raise CursorError("Unknown or expired continuation_token")
+
+    with session.lock:
+        with _sessions_lock:
+            if _sessions.get(token) is not session:
+                raise CursorError("Unknown or expired continuation_token")
+        try:
+            if timeout_ms:
+                with session.conn.cursor() as cur:
+                    set_statement_timeout(cur, timeout_ms)
+            page, done = _fetch_page(token, session, page_size, fmt)
+        except Exception:
+            with _sessions_lock:
+                _sessions.pop(token, None)
+            _release(session)
+            raise
+        if done:
+            with _sessions_lock:
+                _sessions.pop(token, None)
+            _release(session)
+    return page
+
+
+def close_cursor(token: str) -> bool:
+    with _sessions_lock:
+        session = _sessions.pop(token, None)
+    if session is None:
+        return False
+    with session.lock:
+        _release(session)
+    return True
@@ -1,12 +1,17 @@
 import pandas as pd
 import psycopg2
 import os
+import io
+import time
 from dotenv import load_dotenv
 import json
 
 # Load .env variables
 load_dotenv()
 
+# Rows per COPY batch
+BATCH_SIZE = int(os.getenv("PG_LOAD_BATCH_SIZE", "50000"))
+
 # Establish connection
 conn = psycopg2.connect(
     host=os.getenv("PG_HOST", "localhost"),
@@ -23,62 +28,138 @@ df = pd.read_csv("data.csv", encoding="ISO-8859-1")
 # Clean column names
 df.columns = df.columns.str.strip().str.lower()
 
-# Drop rows missing customer ID
-df = df.dropna(subset=["customerid"])
+# Drop rows missing customer ID or with unparseable numbers
+for col in ["customerid", "quantity", "unitprice"]:
+    df[col] = pd.to_numeric(df[col], errors="coerce")
+bad = df[["customerid", "quantity", "unitprice", "stockcode", "invoiceno"]].isna().any(axis=1)
+if bad.any():
+    print(f"Skipping {int(bad.sum())} rows with missing or invalid values")
+df = df[~bad]
 df["customerid"] = df["customerid"].astype(int)
+df["quantity"] = df["quantity"].astype(int)
 
-# Insert Products
-print("Inserting products...")
-products = df[["stockcode", "description", "unitprice"]].drop_duplicates()
-products = products.rename(columns={"stockcode": "code", "description": "name", "unitprice": "price"})
 
-for _, row in products.iterrows():
+def copy_rows(table, columns, frame):
+    buf = io.StringIO()
+    frame.to_csv(buf, header=False, index=False)
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def copy_batch(table, columns, frame):
+    """COPY one batch into staging, splitting it in halves to isolate bad rows.
+
+    Returns the number of rows that were skipped.
+    """
+    cursor.execute("SAVEPOINT batch")
     try:
-        cursor.execute(
-            "INSERT INTO products (code, name, price) VALUES (%s, %s, %s) ON CONFLICT (code) DO NOTHING",
-            (row["code"], row["name"], row["price"])
-        )
-    except Exception as e:
-        print(f"Product insert error: {e}")
-conn.commit()
+        copy_rows(table, columns, frame)
+        cursor.execute("RELEASE SAVEPOINT batch")
+        return 0
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT batch")
+        cursor.execute("RELEASE SAVEPOINT batch")
+        if len(frame) == 1:
+            print(f"Skipping bad {table} row {frame.iloc[0].to_dict()}: {e.pgerror or e}")
+            return 1
+    middle = len(frame) // 2
+    return copy_batch(table, columns, frame.iloc[:middle]) + copy_batch(table, columns, frame.iloc[middle:])
 
-# Insert Users
-print(" Inserting users...")
-users = df[["customerid", "country"]].drop_duplicates()
-users = users.rename(columns={"customerid": "user_id"})
 
-for _, row in users.iterrows():
+def merge_range(table, key, columns, stage, first, last):
+    """Merge staged rows first..last (by _row), splitting the range to isolate bad rows.
+
+    Rows that violate a constraint of the target table (foreign key,
+    NOT NULL, check) are reported and skipped. Returns (inserted, skipped).
+    """
+    cursor.execute("SAVEPOINT merge")
     try:
         cursor.execute(
-            "INSERT INTO users (user_id, country) VALUES (%s, %s) ON CONFLICT (user_id) DO NOTHING",
-            (row["user_id"], row["country"])
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"SELECT {', '.join(columns)} FROM {stage} WHERE _row BETWEEN %s AND %s "
+            f"ON CONFLICT ({key}) DO NOTHING",
+            (first, last),
         )
-    except Exception as e:
-        print(f"User insert error: {e}")
-conn.commit()
+        inserted = cursor.rowcount
+        cursor.execute("RELEASE SAVEPOINT merge")
+        return inserted, 0
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT merge")
+        cursor.execute("RELEASE SAVEPOINT merge")
+        if first == last:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {stage} WHERE _row = %s", (first,))
+            print(f"Skipping bad {table} row {dict(zip(columns, cursor.fetchone()))}: {e.pgerror or e}")
+            return 0, 1
+    middle = (first + last) // 2
+    left = merge_range(table, key, columns, stage, first, middle)
+    right = merge_range(table, key, columns, stage, middle + 1, last)
+    return left[0] + right[0], left[1] + right[1]
 
-# Insert Orders
-print("Inserting orders")
-for invoice, group in df.groupby("invoiceno"):
-    try:
-        items = group[["stockcode", "quantity"]].to_dict(orient="records")
-        total = float((group["quantity"] * group["unitprice"]).sum())  # 👈 Fix here
-        customer_id = int(group["customerid"].iloc[0])
-        items_json = json.dumps(items)
 
+def bulk_load(table, key, frame):
+    """Stream a frame into a temp staging table with COPY, then merge it in.
+
+    Staging and merge run in a single transaction per table; rows whose key
+    already exists are left untouched (ON CONFLICT DO NOTHING). Staged rows
+    are numbered (_row) so a failing merge can be split like a failing COPY.
+    """
+    start = time.perf_counter()
+    columns = list(frame.columns)
+    stage = f"{table}_stage"
+    skipped = 0
+    inserted = 0
+    try:
         cursor.execute(
-            "INSERT INTO orders (invoice, customer_id, items, total) VALUES (%s, %s, %s, %s) ON CONFLICT (invoice) DO NOTHING",
-            (invoice, customer_id, items_json, total)
+            f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS, _row bigserial) ON COMMIT DROP"
         )
+        for offset in range(0, len(frame), BATCH_SIZE):
+            skipped += copy_batch(stage, columns, frame.iloc[offset:offset + BATCH_SIZE])
+        cursor.execute(f"SELECT min(_row), max(_row) FROM {stage}")
+        first, last = cursor.fetchone()
+        if first is not None:
+            inserted, rejected = merge_range(table, key, columns, stage, first, last)
+            skipped += rejected
         conn.commit()
     except Exception as e:
         conn.rollback()
-        print(f"Order insert error for invoice {invoice}: {e}")
-        break 
+        print(f"{table} load failed: {e}")
+        return
+    elapsed = time.perf_counter() - start
+    rate = len(frame) / elapsed if elapsed else 0
+    print(f"  {table}: {len(frame)} rows staged, {inserted} inserted, {skipped} skipped "
+          f"in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+
+
+# Insert Products
+print("Inserting products...")
+products = df[["stockcode", "description", "unitprice"]].drop_duplicates()
+products = products.rename(columns={"stockcode": "code", "description": "name", "unitprice": "price"})
+bulk_load("products", "code", products)
+
+# Insert Users
+print(" Inserting users...")
+users = df[["customerid", "country"]].drop_duplicates()
+users = users.rename(columns={"customerid": "user_id"})
+bulk_load("users", "user_id", users)
+
+# Insert Orders
+print("Inserting orders")
+lines = pd.DataFrame({
+    "invoice": df["invoiceno"],
+    "customer_id": df["customerid"],
+    "item": [json.dumps({"stockcode": code, "quantity": qty})
+             for code, qty in zip(df["stockcode"].tolist(), df["quantity"].tolist())],
+    "line_total": df["quantity"] * df["unitprice"],
+})
+orders = lines.groupby("invoice", sort=False).agg(
+    customer_id=("customer_id", "first"),
+    items=("item", lambda items: "[" + ", ".join(items) + "]"),
+    total=("line_total", "sum"),
+).reset_index()
+bulk_load("orders", "invoice", orders)
 
 
 # Finish 
 cursor.close()
 conn.close()
 print(" Data loaded into PostgreSQL successfully.")
-
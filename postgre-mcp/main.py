@@ -1,52 +1,256 @@
-import pandas as pd
+import os
+import sys
+
+# Modules used by every server (metrics, executor, serialization) live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+import json
 import logging
-from common import get_database_metadata, mcp, conn, get_tables, get_table_schema
+import psycopg2
+from psycopg2.extras import execute_values
+from common import get_database_metadata, mcp, get_conn, pool, get_tables, get_table_schema, get_table_stats, catalog
+from common import PG_STATEMENT_TIMEOUT_MS, statement_timeout_of, set_statement_timeout
+from cursors import CursorError, open_cursor, fetch_page, close_cursor, page_size_of
+from serialization import to_payload, cursor_columns, format_of, budget_of, fetch_within, row_values, RowShapeError
+from result_cache import result_cache, referenced_tables, is_cacheable
+from sql_text import normalize_sql
+from executor import blocking_tool, on_cancel, progress_reporter
+import prepared
+import plans
+import metrics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("postgres_mcp")
 
+# Rows per multi-row INSERT ... VALUES statement in insert_rows
+PG_INSERT_PAGE_SIZE = int(os.getenv("PG_INSERT_PAGE_SIZE", "1000"))
+
+# TABLESAMPLE methods for preview_table: SYSTEM picks random pages, BERNOULLI random rows
+SAMPLE_METHODS = ("system", "bernoulli")
+
 
 #TOOL 1 : list tables 
-@mcp.tool("list_tables", description="List all tables in the database")
+@blocking_tool(mcp, "list_tables", description="List all tables in the database")
 def list_tables(args: dict) -> list:
     return get_tables()
 
 
 # TOOL 2 : Table schema 
-@mcp.tool("get_table_schema", description="Get column names and types for a table")
+@blocking_tool(mcp, "get_table_schema", description="Get column names and types for a table")
 def schema_tool(args: dict) -> list:
     table = args.get("table_name")
     if not table:
         return [{"error": "Missing table_name"}]
     return get_table_schema(table)
 
+# Cached read: results are keyed by normalized SQL, parameters and format
+def _read(query: str, params=None, fmt: str = "columnar", use_cache: bool = True,
+          timeout_ms: int = PG_STATEMENT_TIMEOUT_MS, guard: bool = False, budget=None, report=None) -> dict:
+    if (budget is not None and budget.limited) or report:
+        return _read_within(query, params, fmt, timeout_ms, guard, budget, report)
+    use_cache = use_cache and result_cache.enabled and is_cacheable(query)
+    if use_cache:
+        key = (normalize_sql(query), json.dumps(params, default=str), fmt)
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+        # Taken before the query runs, so a write that lands meanwhile voids the put
+        generation = result_cache.generation()
+
+    with get_conn() as conn, conn.cursor() as cur, on_cancel(conn.cancel):
+        with metrics.phase("db"):
+            warning = plans.admit(cur, query, params) if guard else None
+            prepared.execute_prepared(conn, cur, query, params, timeout_ms)
+            rows = cur.fetchall()
+        with metrics.phase("serialize"):
+            result = to_payload(cursor_columns(cur), rows, fmt)
+    if warning:
+        result["warning"] = warning
+
+    if use_cache:
+        result_cache.put(key, result, referenced_tables(query, get_tables()), generation)
+    return result
+
+# Budgeted read: rows come off a server-side cursor until max_rows/max_bytes is
+# spent, so the rest of the result is never produced. Not cached.
+def _read_within(query: str, params, fmt: str, timeout_ms: int, guard: bool, budget, report) -> dict:
+    with get_conn() as conn, conn.cursor() as cur, on_cancel(conn.cancel):
+        with metrics.phase("db"):
+            warning = plans.admit(cur, query, params) if guard else None
+            set_statement_timeout(cur, timeout_ms)
+            with conn.cursor(name="mcp_budgeted") as named:
+                named.execute(query, params)
+                on_chunk = None
+                if report:
+                    # Each chunk goes out as a progress notification carrying columnar JSON
+                    def on_chunk(rows):
+                        report(budget.rows, None, json.dumps(to_payload(cursor_columns(named), rows)))
+                rows = fetch_within(named.fetchmany, budget, on_chunk)
+                columns = cursor_columns(named)
+            estimated = None
+            if budget.exhausted:
+                try:
+                    estimated = plans.explain(cur, query, params)["plan_rows"]
+                except psycopg2.Error as e:
+                    logger.warning(f"Could not estimate total rows: {e}")
+        with metrics.phase("serialize"):
+            result = to_payload(columns, rows, fmt)
+    if report:
+        result["streamed_rows"] = budget.rows
+    if budget.exhausted:
+        result["truncated"] = budget.marker(estimated)
+    if warning:
+        result["warning"] = warning
+    return result
+
+# Current planner statistics and on-disk pages of one table, a single
+# pg_class lookup by oid
+RELATION_SIZE_QUERY = """
+    SELECT c.reltuples, c.relpages, pg_relation_size(c.oid) / current_setting('block_size')::int
+    FROM pg_class c
+    WHERE c.oid = %s::regclass
+"""
+
+
+def _live_size(table: str):
+    """Row and page estimates of a table as the planner would make them now.
+
+    The last ANALYZE density is scaled to the table's current block count;
+    a never-analyzed table falls back to the planner's own block-based guess.
+    """
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(RELATION_SIZE_QUERY, (f'"{table}"',))
+        reltuples, relpages, pages = cur.fetchone()
+        if reltuples > 0 and relpages > 0:
+            return reltuples / relpages * pages, pages
+        return plans.explain(cur, f'SELECT * FROM "{table}"')["plan_rows"], pages
+
+
+# Random sample of a table: TABLESAMPLE sized from the planner's row
+# estimate, then shuffled so the LIMIT doesn't keep the physically first rows
+def _sample_query(args: dict, table: str, limit: int):
+    method = str(args["sample"]).lower()
+    if method not in SAMPLE_METHODS:
+        raise ValueError(f"Unknown sample method '{method}', expected one of {', '.join(SAMPLE_METHODS)}")
+    percent = args.get("sample_percent")
+    if percent is None:
+        if table not in catalog.tables():
+            raise ValueError(f"Unknown table '{table}'")
+        estimated, pages = _live_size(table)
+        # Oversample so the LIMIT still fills after the shuffle
+        percent = min(100.0, 300.0 * limit / estimated) if estimated else 100.0
+        if method == "system" and pages:
+            # SYSTEM keeps or skips whole pages, so aim for at least 10 of them
+            percent = min(100.0, max(percent, 1000.0 / pages))
+    sample = f'SELECT * FROM "{table}" TABLESAMPLE {method.upper()} (%s)'
+    params = [float(percent)]
+    if args.get("seed") is not None:
+        # Seeded samples must repeat, so they are shuffled by a seeded hash instead of random()
+        sample += " REPEATABLE (%s)"
+        params.append(float(args["seed"]))
+        order = "md5(s::text || %s)"
+        params.append(str(args["seed"]))
+    else:
+        order = "random()"
+    return f"SELECT * FROM ({sample}) AS s ORDER BY {order} LIMIT %s", params + [limit]
+
 # TOOL 3: Preview Table 
-@mcp.tool("preview_table", description="Preview N rows from a table")
-def preview_table(args: dict) -> str:
+@blocking_tool(mcp, "preview_table", description="Preview N rows from a table. Pass sample (system or bernoulli, optional sample_percent and seed) for a random sample, or page_size to page through the whole table with continuation_token. timeout_ms sets the statement time budget; max_rows/max_bytes cap the response and stream=true sends rows as progress notifications")
+def preview_table(args: dict) -> str | dict:
     table = args.get("table_name")
     limit = args.get("limit", 10)
+    if "page_size" in args or "continuation_token" in args:
+        return _paged(args, f'SELECT * FROM "{table}"')
     try:
-        df = pd.read_sql(f'SELECT * FROM "{table}" LIMIT %s', conn, params=[limit])
-        return df.to_string(index=False)
+        budget = budget_of(args)
+        report = progress_reporter() if args.get("stream") else None
+        if args.get("sample"):
+            query, params = _sample_query(args, table, int(limit))
+            # Unseeded samples differ on every call, so only seeded ones are cached
+            use_cache = args.get("cache", True) and args.get("seed") is not None
+            return _read(query, params, format_of(args), use_cache, statement_timeout_of(args),
+                         budget=budget, report=report)
+        return _read(f'SELECT * FROM "{table}" LIMIT %s', (limit,), format_of(args), args.get("cache", True),
+                     statement_timeout_of(args), budget=budget, report=report)
     except Exception as e:
         logger.error(f"Error previewing table: {e}")
         return str(e)
 
 # TOOL 4: read only queries 
-@mcp.tool("run_query", description="Run custom SELECT query")
-def run_query(args: dict) -> str:
+@blocking_tool(mcp, "run_query", description="Run custom SELECT query with optional params (list for %s, object for %(name)s). Pass page_size to stream the result in pages with continuation_token, and timeout_ms to change the statement time budget. max_rows/max_bytes stop reading once the response is that large (the result then has a truncated marker with an estimated total), and stream=true sends rows as progress notifications")
+def run_query(args: dict) -> str | dict:
     query = args.get("query", "")
+    params = args.get("params")
+    if "continuation_token" in args:
+        return _paged(args)
     if not query.lower().strip().startswith("select"):
         return "Only SELECT queries are allowed."
+    if params is not None and not isinstance(params, (list, dict)):
+        return "'params' must be a list or an object."
+    if "page_size" in args:
+        return _paged(args, query, params, guard=True)
     try:
-        df = pd.read_sql(query, conn)
-        return df.to_string(index=False)
+        report = progress_reporter() if args.get("stream") else None
+        return _read(query, params, format_of(args), args.get("cache", True), statement_timeout_of(args), guard=True,
+                     budget=budget_of(args), report=report)
+    except plans.CostGuardError as e:
+        return str(e)
     except Exception as e:
         logger.error(f"Error running query: {e}")
         return str(e)
 
+# Paged reads on a server-side cursor
+def _paged(args: dict, query: str = None, params=None, guard: bool = False) -> dict:
+    page_size = page_size_of(args)
+    token = args.get("continuation_token")
+    try:
+        fmt = format_of(args)
+        if token:
+            return fetch_page(token, page_size, fmt, statement_timeout_of(args))
+        warning = None
+        if guard:
+            with get_conn() as conn, conn.cursor() as cur:
+                warning = plans.admit(cur, query, params)
+        page = open_cursor(query, params, page_size=page_size, fmt=fmt, timeout_ms=statement_timeout_of(args))
+        if warning:
+            page["warning"] = warning
+        return page
+    except (CursorError, ValueError, plans.CostGuardError) as e:
+        return {"error": str(e)}
+    except Exception as e:
+        logger.error(f"Error reading page: {e}")
+        return {"error": str(e)}
+
+
+@blocking_tool(mcp, "close_cursor", description="Release a paged result before reading it to the end")
+def close_cursor_tool(args: dict) -> dict:
+    token = args.get("continuation_token")
+    if not token:
+        return {"error": "Missing continuation_token"}
+    if not close_cursor(token):
+        return {"error": "Unknown or expired continuation_token"}
+    return {"success": "Cursor closed"}
+
+# Estimated plan without running the query
+@blocking_tool(mcp, "explain", description="Show the estimated plan (EXPLAIN FORMAT JSON) of a SELECT query with optional params, with its total cost and row estimate, without running it")
+def explain_tool(args: dict) -> dict:
+    query = args.get("query", "")
+    params = args.get("params")
+    if not query.lower().strip().startswith("select"):
+        return {"error": "Only SELECT queries can be explained."}
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            estimate = plans.explain(cur, query, params)
+        try:
+            estimate["guard"] = plans.check(estimate)
+        except plans.CostGuardError as e:
+            estimate["guard"] = str(e)
+        return estimate
+    except Exception as e:
+        logger.error(f"Error explaining query: {e}")
+        return {"error": str(e)}
+
 # INSERT ROW 
-@mcp.tool("insert_row", description="Insert a row into any table")
+@blocking_tool(mcp, "insert_row", description="Insert a row into any table")
 def insert_row(args: dict) -> dict:
     table = args.get("table_name")
     row_data = args.get("row_data")
@@ -62,19 +266,86 @@ def insert_row(args: dict) -> dict:
 
         query = f'INSERT INTO "{table}" ({column_names}) VALUES ({placeholders})'
         
-        with conn.cursor() as cur:
+        with get_conn() as conn, conn.cursor() as cur:
             cur.execute(query, values)
             conn.commit()
+        result_cache.invalidate(table)
 
         return {"success": f"Inserted into {table}"}
     except Exception as e:
-        conn.rollback()
         logger.error(f"Insert failed: {e}")
         return {"error": str(e)}
 
 
+# INSERT MANY ROWS
+@blocking_tool(mcp, "insert_rows", description="Insert many rows in one transaction, optionally upserting with on_conflict", limit=2)
+def insert_rows(args: dict) -> dict:
+    """
+    args: table_name, columns (list), rows (list of lists or dicts) and
+    optionally on_conflict: {"columns": [...], "action": "update" | "nothing",
+    "update_columns": [...]} (update_columns defaults to all non-key columns).
+    Without columns they are the keys of the first row. Dict rows must have
+    exactly the columns as keys and list rows one value per column;
+    otherwise nothing is written and each bad row is reported.
+    """
+    table = args.get("table_name")
+    columns = args.get("columns")
+    rows = args.get("rows")
+    on_conflict = args.get("on_conflict")
+
+    if not table or not rows or not isinstance(rows, list):
+        return {"error": "Missing 'table_name' or 'rows'"}
+    if not columns:
+        if not isinstance(rows[0], dict):
+            return {"error": "Missing 'columns'"}
+        columns = list(rows[0].keys())
+
+    try:
+        values = row_values(rows, columns)
+    except RowShapeError as e:
+        return {"error": str(e), "rows": e.rows}
+
+    try:
+        column_names = ", ".join([f'"{col}"' for col in columns])
+        query = f'INSERT INTO "{table}" ({column_names}) VALUES %s'
+
+        if on_conflict:
+            keys = on_conflict.get("columns") or []
+            if not keys:
+                return {"error": "on_conflict needs 'columns'"}
+            target = ", ".join([f'"{col}"' for col in keys])
+            if on_conflict.get("action", "update") == "nothing":
+                query += f" ON CONFLICT ({target}) DO NOTHING"
+            else:
+                update_columns = on_conflict.get("update_columns") or [c for c in columns if c not in keys]
+                set_clause = ", ".join([f'"{col}" = EXCLUDED."{col}"' for col in update_columns])
+                query += f" ON CONFLICT ({target}) DO UPDATE SET {set_clause}"
+            # xmax is 0 only for freshly inserted rows, so updates can be told apart
+            query += " RETURNING (xmax = 0)"
+
+        with get_conn() as conn, conn.cursor() as cur:
+            result = execute_values(cur, query, values, page_size=PG_INSERT_PAGE_SIZE, fetch=bool(on_conflict))
+            conn.commit()
+        result_cache.invalidate(table)
+
+        if on_conflict:
+            inserted = sum(1 for (is_insert,) in result if is_insert)
+            updated = len(result) - inserted
+        else:
+            inserted, updated = len(values), 0
+        return {
+            "success": f"Wrote {len(values)} rows to {table}",
+            "inserted": inserted,
+            "updated": updated,
+            "skipped": len(values) - inserted - updated,
+        }
+    except Exception as e:
+        logger.error(f"Bulk insert failed: {e}")
+        return {"error": str(e)}
+
+
 # UPDATE ROW 
-@mcp.tool("update_row", description="Update rows in a table based on condition")
+@blocking_tool(mcp, "update_row", description="Update rows in a table based on condition")
 def update_row(args: dict) -> dict:
     table = args.get("table_name")
     updates = args.get("update_data")
@@ -88,19 +359,19 @@ def update_row(args: dict) -> dict:
         values = list(updates.values())
         query = f'UPDATE "{table}" SET {set_clause} WHERE {condition}'
 
-        with conn.cursor() as cur:
+        with get_conn() as conn, conn.cursor() as cur:
             cur.execute(query, values)
             conn.commit()
+        result_cache.invalidate(table)
 
         return {"success": f"Updated rows in {table}"}
     except Exception as e:
-        conn.rollback()
         logger.error(f"Update failed: {e}")
         return {"error": str(e)}
     
 
 # DELETE ROW 
-@mcp.tool("delete_row", description="Delete rows from a table based on condition")
+@blocking_tool(mcp, "delete_row", description="Delete rows from a table based on condition")
 def delete_row(args: dict) -> dict:
     table = args.get("table_name")
     condition = args.get("where")
@@ -110,18 +381,18 @@ def delete_row(args: dict) -> dict:
 
     try:
         query = f'DELETE FROM "{table}" WHERE {condition}'
-        with conn.cursor() as cur:
+        with get_conn() as conn, conn.cursor() as cur:
             cur.execute(query)
             conn.commit()
+        result_cache.invalidate(table)
 
         return {"success": f"Deleted from {table}"}
     except Exception as e:
-        conn.rollback()
         logger.error(f"Delete failed: {e}")
         return {"error": str(e)}
     
 # meta data tool
-@mcp.tool("get_database_metadata", description="Get metadata (schema) for all tables in the database")
+@blocking_tool(mcp, "get_database_metadata", description="Get metadata (schema) for all tables in the database")
 def get_metadata_tool(data: dict) -> list:
     try:
         return get_database_metadata()
@@ -129,12 +400,47 @@ def get_metadata_tool(data: dict) -> list:
         logger.error(f"Metadata tool error: {e}")
         return [{"error": str(e)}]
 
-        return [{"error": str(e)}]
+# Planner statistics and sizes, read from the catalog without scanning the table
+@blocking_tool(mcp, "table_stats", description="Get a table's estimated row count, table and index sizes, and per-column pg_stats (null fraction, n_distinct, most common values)")
+def table_stats_tool(args: dict) -> dict:
+    table = args.get("table_name")
+    if not table:
+        return {"error": "Missing table_name"}
+    try:
+        stats = get_table_stats(table, int(args.get("mcv_limit", 10)))
+    except Exception as e:
+        logger.error(f"Error reading table stats: {e}")
+        return {"error": str(e)}
+    if stats is None:
+        return {"error": f"Unknown table '{table}'"}
+    return stats
+
+# Per-tool latency, DB vs serialization time, rows, bytes and errors
+@blocking_tool(mcp, "metrics", description="Get per-tool call counts, errors, latency percentiles, DB and serialization time, rows and bytes returned. format=prometheus returns Prometheus text in 'text'")
+def metrics_tool(args: dict) -> dict:
+    if args.get("format") == "prometheus":
+        return {"format": "prometheus", "text": metrics.prometheus_text()}
+    return metrics.snapshot()
+
+# result cache stats tool
+@blocking_tool(mcp, "cache_stats", description="Get query result cache hit, miss and eviction counters")
+def cache_stats_tool(data: dict) -> dict:
+    return result_cache.stats()
+
+# prepared statement stats tool
+@blocking_tool(mcp, "plan_cache_stats", description="Get prepared statement cache hit rate for run_query")
+def plan_cache_stats_tool(data: dict) -> dict:
+    return prepared.stats()
 
+# pool stats tool
+@blocking_tool(mcp, "pool_stats", description="Get connection pool usage and wait-time statistics")
+def pool_stats_tool(data: dict) -> dict:
+    return pool.stats()
 
 
 # Run server
 if __name__ == "__main__":
+    metrics.start_exporters()
     mcp.run(transport="stdio")
 
 
@@ -0,0 +1,45 @@
+import os
+
+# Admission guard on planner estimates for run_query; 0 disables a check
+PG_MAX_QUERY_COST = float(os.getenv("PG_MAX_QUERY_COST", "0"))
+PG_MAX_QUERY_ROWS = float(os.getenv("PG_MAX_QUERY_ROWS", "0"))
+# "reject" refuses queries over a threshold, "warn" runs them with a warning
+PG_COST_GUARD_MODE = os.getenv("PG_COST_GUARD_MODE", "reject")
+
+
+class CostGuardError(Exception):
+    pass
+
+
+def explain(cur, query: str, params=None) -> dict:
+    """Estimated plan of a query; the query itself is not executed."""
+    cur.execute(f"EXPLAIN (FORMAT JSON) {query}", params)
+    plan = cur.fetchone()[0]
+    top = plan[0]["Plan"]
+    return {"total_cost": top["Total Cost"], "plan_rows": top["Plan Rows"], "plan": plan}
+
+
+def check(estimate: dict):
+    """Apply the thresholds to an estimate.
+
+    Returns None when the query is within budget, a warning in "warn"
+    mode, and raises CostGuardError in "reject" mode.
+    """
+    problems = []
+    if PG_MAX_QUERY_COST and estimate["total_cost"] > PG_MAX_QUERY_COST:
+        problems.append(f"estimated cost {estimate['total_cost']:.0f} exceeds {PG_MAX_QUERY_COST:.0f}")
+    if PG_MAX_QUERY_ROWS and estimate["plan_rows"] > PG_MAX_QUERY_ROWS:
+        problems.append(f"estimated rows {estimate['plan_rows']:.0f} exceed {PG_MAX_QUERY_ROWS:.0f}")
+    if not problems:
+        return None
+    message = "Query " + " and ".join(problems)
+    if PG_COST_GUARD_MODE == "warn":
+        return message
+    raise CostGuardError(f"{message}; narrow it or inspect it with the explain tool")
+
+
+def admit(cur, query: str, params=None):
+    """Plan the query and apply the guard, if any threshold is configured."""
+    if not (PG_MAX_QUERY_COST or PG_MAX_QUERY_ROWS):
+        return None
+    return check(explain(cur, query, params))
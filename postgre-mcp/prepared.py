@@ -0,0 +1,81 @@
+import os
+import itertools
+import threading
+import psycopg2
+from sql_text import normalize_sql, to_server_placeholders
+from common import set_statement_timeout
+
+# Prepared statements kept per connection before the least recently used is deallocated
+PG_PREPARED_CACHE_SIZE = int(os.getenv("PG_PREPARED_CACHE_SIZE", "100"))
+
+_names = itertools.count(1)
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "deallocated": 0, "replanned": 0}
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def execute_prepared(conn, cur, query: str, params=None, timeout_ms: int = None, _replanned: bool = False):
+    """Execute a query through a server-side prepared statement.
+
+    Statements are cached per connection (conn.prepared, an LRU keyed by
+    normalized SQL), so a repeated statement shape skips parse and plan.
+    timeout_ms sets statement_timeout for the transaction. Queries without
+    parameters run as plain statements, so their % signs stay as written.
+    """
+    if timeout_ms:
+        set_statement_timeout(cur, timeout_ms)
+    if params is None:
+        cur.execute(query)
+        return
+    key = normalize_sql(query)
+    entry = conn.prepared.get(key)
+    if entry is None:
+        _count("misses")
+        sql, order = to_server_placeholders(query)
+        name = f"mcp_stmt_{next(_names)}"
+        cur.execute(f"PREPARE {name} AS {sql}")
+        entry = (name, order)
+        conn.prepared[key] = entry
+        while len(conn.prepared) > PG_PREPARED_CACHE_SIZE:
+            _, (old_name, _) = conn.prepared.popitem(last=False)
+            cur.execute(f"DEALLOCATE {old_name}")
+            _count("deallocated")
+    else:
+        _count("hits")
+        conn.prepared.move_to_end(key)
+
+    name, order = entry
+    if isinstance(params, dict):
+        values = [params[p] for p in order]
+    else:
+        values = list(params or [])
+    if len(values) != len(order):
+        raise ValueError(f"Query expects {len(order)} parameters, got {len(values)}")
+
+    execute_sql = f"EXECUTE {name}" + (f" ({', '.join(['%s'] * len(values))})" if values else "")
+    try:
+        cur.execute(execute_sql, values)
+    except psycopg2.errors.FeatureNotSupported:
+        if _replanned:
+            raise
+        # "cached plan must not change result type": the table changed under
+        # the statement, so drop it and prepare again (once)
+        conn.rollback()
+        conn.prepared.pop(key, None)
+        cur.execute(f"DEALLOCATE {name}")
+        _count("replanned")
+        execute_prepared(conn, cur, query, params, timeout_ms, _replanned=True)
+
+
+def stats() -> dict:
+    with _stats_lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else 0.0,
+            "cache_size_per_connection": PG_PREPARED_CACHE_SIZE,
+        }
@@ -0,0 +1,136 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from sql_text import strip_literals
+
+# Cache settings; PG_RESULT_CACHE_BYTES=0 disables caching
+PG_RESULT_CACHE_BYTES = int(os.getenv("PG_RESULT_CACHE_BYTES", str(64 * 1024 * 1024)))
+PG_RESULT_CACHE_TTL = float(os.getenv("PG_RESULT_CACHE_TTL", "60"))
+
+_IDENTIFIER = re.compile(r'"((?:[^"]|"")+)"|([A-Za-z_][A-Za-z0-9_$]*)')
+# Functions whose result changes between calls; queries using them are never cached
+_VOLATILE = re.compile(
+    r"\b(now|random|setseed|nextval|setval|currval|lastval|clock_timestamp|statement_timestamp|"
+    r"transaction_timestamp|timeofday|current_timestamp|current_time|current_date|localtime|"
+    r"localtimestamp|gen_random_uuid|uuid_generate_v[14]|txid_current|pg_sleep)\b",
+    re.IGNORECASE,
+)
+
+
+def referenced_tables(query: str, tables) -> set:
+    """Known table names that appear as identifiers in the query."""
+    known = {t.lower(): t for t in tables}
+    found = set()
+    for quoted, bare in _IDENTIFIER.findall(strip_literals(query)):
+        if quoted:
+            name = quoted.replace('""', '"')
+            if name in known.values():
+                found.add(name)
+        elif bare.lower() in known:
+            found.add(known[bare.lower()])
+    return found
+
+
+def is_cacheable(query: str) -> bool:
+    """False for queries calling volatile functions such as now() or random()."""
+    return not _VOLATILE.search(strip_literals(query))
+
+
+class ResultCache:
+    """LRU cache of read-tool results bounded by total bytes and entry age.
+
+    Each entry remembers the tables its query read, so a write to a table
+    drops exactly the results that may have changed. Entries whose tables
+    could not be determined are dropped on every write.
+
+    A read that started before a write could otherwise store its stale
+    result after the write's invalidate(). Readers take generation() before
+    running the query and pass it to put(), which drops the result if any
+    of its tables was invalidated since.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (value, size, tables, expires)
+        self._bytes = 0
+        self._generation = 0            # bumped by every invalidate()
+        self._invalidated_at = {}       # table -> generation of its last invalidate()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "expired": 0, "stale_puts": 0}
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _drop(self, key):
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, _, _, expires = entry
+            if expires < time.monotonic():
+                self._drop(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return dict(value)
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def _changed_since(self, tables, generation: int) -> bool:
+        if not tables:
+            return self._generation != generation
+        return any(self._invalidated_at.get(table, -1) > generation for table in tables)
+
+    def put(self, key, value: dict, tables: set, generation: int):
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._changed_since(tables, generation):
+                self._stats["stale_puts"] += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+            while self._entries and self._bytes + size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+            self._entries[key] = (dict(value), size, frozenset(tables), time.monotonic() + self.ttl)
+            self._bytes += size
+
+    def invalidate(self, table: str):
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at[table] = self._generation
+            stale = [k for k, (_, _, tables, _) in self._entries.items() if not tables or table in tables]
+            for key in stale:
+                self._drop(key)
+            self._stats["invalidations"] += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+            }
+
+
+result_cache = ResultCache(PG_RESULT_CACHE_BYTES, PG_RESULT_CACHE_TTL)
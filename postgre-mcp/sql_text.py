@@ -0,0 +1,53 @@
+import re
+
+# String constants: E'' with backslash escapes, plain '', and $tag$...$tag$
+_STRING_LITERAL = (
+    r"(?<![\w$])[Ee]'(?:[^'\\]|\\.|'')*'"
+    r"|'(?:[^']|'')*'"
+    r"|(?<![\w$])\$(?P<tag>(?:[A-Za-z_]\w*)?)\$[\s\S]*?\$(?P=tag)\$"
+)
+# String literals and quoted identifiers are kept verbatim; whitespace runs
+# outside them collapse to one space
+_TOKENS = re.compile(rf"""({_STRING_LITERAL}|"(?:[^"]|"")*")|\s+""")
+_LITERALS = re.compile(_STRING_LITERAL)
+# Literals and quoted identifiers pass through untouched; %% is a literal %
+_PLACEHOLDER = re.compile(rf"""({_STRING_LITERAL}|"(?:[^"]|"")*")|%%|%\((?P<name>\w+)\)s|%s""")
+
+
+def normalize_sql(query: str) -> str:
+    query = _TOKENS.sub(lambda m: m.group(1) or " ", query).strip()
+    return query.rstrip(";").rstrip()
+
+
+def to_server_placeholders(query: str):
+    """Rewrite %s / %(name)s placeholders as $1..$n.
+
+    Returns the rewritten query and the parameter order: positions for
+    positional parameters, names for named ones.
+    """
+    order = []
+    positions = {}
+
+    def replace(match):
+        if match.group(1):
+            return match.group(1)
+        if match.group(0) == "%%":
+            return "%"
+        name = match.group("name")
+        if name is None:
+            order.append(len(order))
+            return f"${len(order)}"
+        if name not in positions:
+            order.append(name)
+            positions[name] = len(order)
+        return f"${positions[name]}"
+
+    rewritten = _PLACEHOLDER.sub(replace, query)
+    if any(isinstance(p, int) for p in order) and any(isinstance(p, str) for p in order):
+        raise ValueError("Use either positional (%s) or named (%(name)s) parameters, not both")
+    return rewritten, order
+
+
+def strip_literals(query: str) -> str:
+    """The query with every string constant blanked out."""
+    return _LITERALS.sub(" ", query)
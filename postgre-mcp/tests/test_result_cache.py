@@ -0,0 +1,36 @@
+import pytest
+
+from result_cache import ResultCache, is_cacheable
+
+
+@pytest.mark.parametrize("query, cacheable", [
+    ("SELECT * FROM orders", True),
+    ("SELECT 'now()' FROM orders", True),
+    ("SELECT now()", False),
+    ("SELECT * FROM orders ORDER BY random()", False),
+    ("SELECT nextval('s')", False),
+    ("SELECT current_timestamp", False),
+])
+def test_is_cacheable(query, cacheable):
+    assert is_cacheable(query) is cacheable
+
+
+def test_put_after_invalidate_is_dropped():
+    cache = ResultCache(1 << 20, 60)
+    generation = cache.generation()
+    cache.invalidate("orders")
+    cache.put("k", {"rows": []}, {"orders"}, generation)
+    assert cache.get("k") is None
+
+    generation = cache.generation()
+    cache.invalidate("users")
+    cache.put("k", {"rows": []}, {"orders"}, generation)
+    assert cache.get("k") == {"rows": []}
+
+
+def test_put_with_unknown_tables_is_dropped_after_any_write():
+    cache = ResultCache(1 << 20, 60)
+    generation = cache.generation()
+    cache.invalidate("users")
+    cache.put("k", {"rows": []}, set(), generation)
+    assert cache.get("k") is None
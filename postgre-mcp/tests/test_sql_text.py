@@ -0,0 +1,32 @@
+import pytest
+
+from sql_text import normalize_sql, strip_literals, to_server_placeholders
+
+
+@pytest.mark.parametrize("query, rewritten, order", [
+    ("SELECT * FROM t WHERE a = %s AND b = %s", "SELECT * FROM t WHERE a = $1 AND b = $2", [0, 1]),
+    ("SELECT %(a)s, %(b)s, %(a)s", "SELECT $1, $2, $1", ["a", "b"]),
+    ("SELECT '%s', %s", "SELECT '%s', $1", [0]),
+    ("SELECT 'it''s %s', %s", "SELECT 'it''s %s', $1", [0]),
+    ("SELECT E'it\\'s %s', %s", "SELECT E'it\\'s %s', $1", [0]),
+    ("SELECT $$a %s$$, %s", "SELECT $$a %s$$, $1", [0]),
+    ("SELECT $fn$ it's %(x)s $fn$, %(y)s", "SELECT $fn$ it's %(x)s $fn$, $1", ["y"]),
+    ('SELECT "%s" FROM t WHERE a = %s', 'SELECT "%s" FROM t WHERE a = $1', [0]),
+    ("SELECT a$b, %s LIKE 'x%%'", "SELECT a$b, $1 LIKE 'x%%'", [0]),
+    ("SELECT 100 %% 7", "SELECT 100 % 7", []),
+])
+def test_to_server_placeholders(query, rewritten, order):
+    assert to_server_placeholders(query) == (rewritten, order)
+
+
+def test_mixed_placeholders_are_rejected():
+    with pytest.raises(ValueError):
+        to_server_placeholders("SELECT %s, %(a)s")
+
+
+def test_normalize_sql_keeps_literals_verbatim():
+    assert normalize_sql("SELECT  $$a   b$$ ,\n E'x  y'  ;") == "SELECT $$a   b$$ , E'x  y'"
+
+
+def test_strip_literals_blanks_every_string_constant():
+    assert strip_literals("SELECT 'a', E'b', $$c$$, \"d\" FROM t").split() == ["SELECT", ",", ",", ",", "\"d\"", "FROM", "t"]
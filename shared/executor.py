@@ -0,0 +1,151 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+import anyio
+from anyio import from_thread, to_thread
+from mcp.server.fastmcp import Context
+import metrics
+
+# Threads shared by every tool; keep at or below the connection pool size
+MCP_TOOL_WORKERS = int(os.getenv("MCP_TOOL_WORKERS", "10"))
+# Concurrent calls allowed per tool unless the tool sets its own limit
+MCP_TOOL_CONCURRENCY = int(os.getenv("MCP_TOOL_CONCURRENCY", "8"))
+
+# Limiters bind to the running event loop, so they are created on first use
+_workers = None
+
+
+def _worker_limiter():
+    global _workers
+    if _workers is None:
+        _workers = anyio.CapacityLimiter(MCP_TOOL_WORKERS)
+    return _workers
+
+
+class CallCancelled(Exception):
+    pass
+
+
+class _Call:
+    """Cancellation hook for one tool call running on a worker thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel = None
+        self.cancelled = False
+
+    def set_canceller(self, cancel):
+        with self._lock:
+            if cancel is not None and self.cancelled:
+                raise CallCancelled("Tool call was cancelled by the client")
+            self._cancel = cancel
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            cancel = self._cancel
+        if cancel is not None:
+            cancel()
+
+
+_local = threading.local()
+
+
+@contextmanager
+def on_cancel(cancel):
+    """Call `cancel` (from another thread) if the client abandons this tool call.
+
+    Wrap the blocking driver call with it, e.g. on_cancel(conn.cancel).
+    Outside a tool call this does nothing.
+    """
+    call = getattr(_local, "call", None)
+    if call is None:
+        yield
+        return
+    call.set_canceller(cancel)
+    try:
+        yield
+    finally:
+        call.set_canceller(None)
+
+
+def _progress_sender(ctx):
+    """Worker-thread callable for ctx.report_progress, or None if the client sent no progressToken."""
+    try:
+        meta = ctx.request_context.meta if ctx is not None else None
+    except ValueError:  # called outside a request, e.g. directly through mcp.call_tool
+        return None
+    if meta is None or meta.progressToken is None:
+        return None
+
+    def send(progress, total=None, message=None):
+        from_thread.run(ctx.report_progress, progress, total, message)
+    return send
+
+
+def progress_reporter():
+    """report(progress, total=None, message=None) for the current tool call.
+
+    None outside a tool call or when the client did not ask for progress.
+    """
+    return getattr(_local, "progress", None)
+
+
+def blocking_tool(mcp, name: str, description: str = None, limit: int = None):
+    """Register a blocking tool that runs on a worker thread.
+
+    FastMCP calls sync tools directly on the event loop, so one slow query
+    stalls every other request. The registered handler is async: it waits
+    for a slot under the tool's own limit, then hands the call to the
+    shared worker pool. If the client abandons the request, the canceller
+    registered with on_cancel() stops the query on the server. The
+    undecorated function is returned unchanged, so it can still be called
+    directly. Every call is recorded in metrics, and progress_reporter()
+    lets it send progress notifications while it runs.
+    """
+    def decorator(fn):
+        limiter = None
+        str_errors = metrics.strings_are_errors(fn)
+
+        @functools.wraps(fn)
+        async def handler(*args, ctx: Context = None, **kwargs):
+            nonlocal limiter
+            if limiter is None:
+                limiter = anyio.CapacityLimiter(limit or MCP_TOOL_CONCURRENCY)
+            call = _Call()
+            progress = _progress_sender(ctx)
+
+            def run():
+                _local.call = call
+                _local.progress = progress
+                metrics.begin()
+                start = time.perf_counter()
+                result, failed = None, True
+                try:
+                    result = fn(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    _local.call = None
+                    _local.progress = None
+                    metrics.end(name, time.perf_counter() - start, result, failed, str_errors)
+
+            async with limiter:
+                try:
+                    return await to_thread.run_sync(run, abandon_on_cancel=True, limiter=_worker_limiter())
+                except anyio.get_cancelled_exc_class():
+                    call.cancel()
+                    raise
+
+        # FastMCP injects the request Context as ctx; fn itself never sees it
+        signature = inspect.signature(fn)
+        ctx_param = inspect.Parameter("ctx", inspect.Parameter.KEYWORD_ONLY, default=None, annotation=Context)
+        handler.__signature__ = signature.replace(parameters=[*signature.parameters.values(), ctx_param])
+        handler.__annotations__ = {**fn.__annotations__, "ctx": Context}
+        mcp.tool(name, description=description)(handler)
+        return fn
+
+    return decorator
@@ -0,0 +1,211 @@
+import inspect
+import os
+import threading
+import time
+import typing
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pydantic_core
+
+# MCP_METRICS=0 turns recording off
+MCP_METRICS = os.getenv("MCP_METRICS", "1") != "0"
+# Optional Prometheus exposition: a text file rewritten every interval, and/or an HTTP endpoint
+MCP_METRICS_FILE = os.getenv("MCP_METRICS_FILE", "")
+MCP_METRICS_INTERVAL = float(os.getenv("MCP_METRICS_INTERVAL", "15"))
+MCP_METRICS_HOST = os.getenv("MCP_METRICS_HOST", "127.0.0.1")
+MCP_METRICS_PORT = int(os.getenv("MCP_METRICS_PORT", "0"))
+
+# Latency histogram bucket bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)   # last one is +Inf
+        self.seconds = 0.0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+
+
+_tools = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def strings_are_errors(fn) -> bool:
+    """Tools that return data as a dict or list use plain strings for errors."""
+    annotation = inspect.signature(fn).return_annotation
+    return annotation is not str and str in typing.get_args(annotation)
+
+
+@contextmanager
+def phase(name: str):
+    """Add the time spent in the block to the current call's "db" or "serialize" time."""
+    phases = getattr(_local, "phases", None)
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] += time.perf_counter() - start
+
+
+def begin():
+    _local.phases = {"db": 0.0, "serialize": 0.0}
+
+
+def _is_error(result, str_errors: bool) -> bool:
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list):
+        return len(result) == 1 and isinstance(result[0], dict) and "error" in result[0]
+    return str_errors and isinstance(result, str)
+
+
+def _rows(result) -> int:
+    """Rows or documents a result carries; scalar counts (e.g. "count") are not rows."""
+    if isinstance(result, list):
+        return sum(isinstance(item, dict) for item in result)
+    if isinstance(result, dict):
+        if isinstance(result.get("row_count"), int):
+            return result["row_count"]
+        if isinstance(result.get("documents"), list):
+            return len(result["documents"])
+    return 0
+
+
+def _size(result) -> int:
+    """Compact JSON size of a result, encoded the way FastMCP encodes it (in Rust)."""
+    return len(pydantic_core.to_json(result, fallback=str)) if result is not None else 0
+
+
+def end(tool: str, seconds: float, result=None, failed: bool = False, str_errors: bool = False):
+    """Record one finished call on the worker thread that ran it."""
+    phases = getattr(_local, "phases", None) or {"db": 0.0, "serialize": 0.0}
+    _local.phases = None
+    if not MCP_METRICS:
+        return
+    failed = failed or _is_error(result, str_errors)
+    rows = 0 if failed else _rows(result)
+    size = _size(result)
+
+    bucket = next((i for i, bound in enumerate(BUCKETS) if seconds <= bound), len(BUCKETS))
+    with _lock:
+        stats = _tools.get(tool)
+        if stats is None:
+            stats = _tools[tool] = _ToolStats()
+        stats.calls += 1
+        stats.errors += failed
+        stats.buckets[bucket] += 1
+        stats.seconds += seconds
+        stats.db_seconds += phases["db"]
+        stats.serialize_seconds += phases["serialize"]
+        stats.rows += rows
+        stats.bytes += size
+
+
+def _quantile(buckets: list, calls: int, q: float):
+    """Upper bound (ms) of the bucket holding the q-th call; None past the last bound."""
+    seen = 0
+    for bound, count in zip(BUCKETS, buckets):
+        seen += count
+        if seen >= q * calls:
+            return bound * 1000
+    return None
+
+
+def snapshot() -> dict:
+    with _lock:
+        tools = {name: vars(stats).copy() for name, stats in _tools.items()}
+    result = {}
+    for name, s in sorted(tools.items()):
+        calls = s["calls"]
+        result[name] = {
+            "calls": calls,
+            "errors": s["errors"],
+            "avg_ms": round(1000 * s["seconds"] / calls, 3) if calls else 0.0,
+            "p50_ms": _quantile(s["buckets"], calls, 0.5),
+            "p95_ms": _quantile(s["buckets"], calls, 0.95),
+            "p99_ms": _quantile(s["buckets"], calls, 0.99),
+            "db_ms": round(1000 * s["db_seconds"], 3),
+            "serialize_ms": round(1000 * s["serialize_seconds"], 3),
+            "rows": s["rows"],
+            "bytes": s["bytes"],
+        }
+    return result
+
+
+def prometheus_text() -> str:
+    with _lock:
+        tools = {name: vars(stats).copy() for name, stats in sorted(_tools.items())}
+    lines = []
+
+    def metric(name, kind, help_text, values):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(values)
+
+    def per_tool(key):
+        return [f'{{tool="{name}"}} {s[key]}' for name, s in tools.items()]
+
+    for name, kind, help_text, key in (
+        ("mcp_tool_calls_total", "counter", "Tool calls.", "calls"),
+        ("mcp_tool_errors_total", "counter", "Tool calls that failed or returned an error.", "errors"),
+        ("mcp_tool_db_seconds_total", "counter", "Time spent in database calls.", "db_seconds"),
+        ("mcp_tool_serialize_seconds_total", "counter", "Time spent building result payloads.", "serialize_seconds"),
+        ("mcp_tool_rows_total", "counter", "Rows or documents returned.", "rows"),
+        ("mcp_tool_bytes_total", "counter", "JSON bytes returned.", "bytes"),
+    ):
+        metric(name, kind, help_text, [name + value for value in per_tool(key)])
+
+    histogram = []
+    for name, s in tools.items():
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), s["buckets"]):
+            seen += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            histogram.append(f'mcp_tool_latency_seconds_bucket{{tool="{name}",le="{le}"}} {seen}')
+        histogram.append(f'mcp_tool_latency_seconds_sum{{tool="{name}"}} {s["seconds"]}')
+        histogram.append(f'mcp_tool_latency_seconds_count{{tool="{name}"}} {s["calls"]}')
+    metric("mcp_tool_latency_seconds", "histogram", "Tool call latency.", histogram)
+    return "\n".join(lines) + "\n"
+
+
+def _write_file():
+    while True:
+        tmp = f"{MCP_METRICS_FILE}.tmp"
+        with open(tmp, "w") as f:
+            f.write(prometheus_text())
+        os.replace(tmp, MCP_METRICS_FILE)   # readers never see a partial file
+        time.sleep(MCP_METRICS_INTERVAL)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # no per-request access log
+
+
+def start_exporters():
+    """Start the optional file dump and /metrics endpoint on daemon threads."""
+    if MCP_METRICS_FILE:
+        threading.Thread(target=_write_file, name="metrics-file", daemon=True).start()
+    if MCP_METRICS_PORT:
+        server = ThreadingHTTPServer((MCP_METRICS_HOST, MCP_METRICS_PORT), _Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
@@ -0,0 +1,208 @@
+import base64
+import datetime
+import decimal
+import json
+import os
+import uuid
+
+# Result formats understood by every read tool
+FORMATS = ("columnar", "arrow")
+
+# Values JSON already handles; checked by exact type on the hot path
+_PLAIN_TYPES = {type(None), bool, int, float, str}
+
+# Default response budget for read tools (max_rows / max_bytes); 0 means no limit
+MCP_MAX_RESPONSE_ROWS = int(os.getenv("MCP_MAX_RESPONSE_ROWS", "0"))
+MCP_MAX_RESPONSE_BYTES = int(os.getenv("MCP_MAX_RESPONSE_BYTES", "0"))
+# Rows pulled from the driver per round while a budget is being filled
+MCP_FETCH_CHUNK_ROWS = int(os.getenv("MCP_FETCH_CHUNK_ROWS", "500"))
+# Bad input rows described individually in a RowShapeError
+MAX_REPORTED_ROWS = 100
+
+
+def format_of(args: dict) -> str:
+    fmt = args.get("format") or "columnar"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {', '.join(FORMATS)}")
+    return fmt
+
+
+class ResponseBudget:
+    """Row and byte limits for one read response; 0 means no limit.
+
+    Bytes are the approximate JSON size of each row. Once a row does not
+    fit, `exhausted` names the limit that was hit and reading stops.
+    """
+
+    def __init__(self, max_rows: int = 0, max_bytes: int = 0):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.bytes = 0
+        self.exhausted = None
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.max_rows or self.max_bytes)
+
+    def chunk_size(self) -> int:
+        """Rows to fetch next; one past the row limit, to tell "exactly full" from "cut"."""
+        if self.max_rows:
+            return max(1, min(MCP_FETCH_CHUNK_ROWS, self.max_rows - self.rows + 1))
+        return MCP_FETCH_CHUNK_ROWS
+
+    def take(self, rows: list) -> list:
+        """The leading rows that still fit."""
+        kept = len(rows)
+        if self.max_rows and self.rows + kept > self.max_rows:
+            kept = self.max_rows - self.rows
+            self.exhausted = "max_rows"
+        if self.max_bytes:
+            for i in range(kept):
+                size = len(json.dumps(rows[i], default=str)) + 1
+                if self.bytes + size > self.max_bytes:
+                    kept = i
+                    self.exhausted = "max_bytes"
+                    break
+                self.bytes += size
+        self.rows += kept
+        return rows[:kept]
+
+    def marker(self, estimated_total_rows=None) -> dict:
+        """What a truncated response reports in its "truncated" field."""
+        return {
+            "reason": self.exhausted,
+            "rows_returned": self.rows,
+            "estimated_total_rows": estimated_total_rows,
+        }
+
+
+def budget_of(args: dict) -> ResponseBudget:
+    try:
+        max_rows = int(args.get("max_rows") or MCP_MAX_RESPONSE_ROWS)
+        max_bytes = int(args.get("max_bytes") or MCP_MAX_RESPONSE_BYTES)
+    except (TypeError, ValueError):
+        raise ValueError("'max_rows' and 'max_bytes' must be integers")
+    if max_rows < 0 or max_bytes < 0:
+        raise ValueError("'max_rows' and 'max_bytes' must not be negative")
+    return ResponseBudget(max_rows, max_bytes)
+
+
+def fetch_within(fetch, budget: ResponseBudget, on_chunk=None) -> list:
+    """Call fetch(n) (e.g. cursor.fetchmany) until it runs dry or the budget is spent.
+
+    With on_chunk, each chunk that fits is handed to it as soon as it
+    arrives instead of being collected into the returned list.
+    """
+    rows = []
+    while True:
+        size = budget.chunk_size()
+        chunk = fetch(size)
+        kept = budget.take(chunk)
+        if on_chunk is None:
+            rows.extend(kept)
+        elif kept:
+            on_chunk(kept)
+        if budget.exhausted or len(chunk) < size:
+            return rows
+
+
+def encode_value(value):
+    """Convert a driver value into something JSON can carry without loss."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, dict):
+        return {str(k): encode_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [encode_value(v) for v in value]
+    return str(value)
+
+
+def to_payload(columns, rows, fmt: str = "columnar") -> dict:
+    """Build a compact result: column names once, then one list per row.
+
+    fmt="arrow" returns the same data as a base64 Arrow IPC stream instead
+    (requires pyarrow).
+    """
+    if fmt == "arrow":
+        return _arrow_payload(columns, rows)
+    rows = [[v if type(v) in _PLAIN_TYPES else encode_value(v) for v in row] for row in rows]
+    return {"columns": list(columns), "rows": rows, "row_count": len(rows)}
+
+
+def cursor_columns(cursor) -> list:
+    return [col[0] for col in cursor.description] if cursor.description else []
+
+
+class RowShapeError(ValueError):
+    """Input rows that do not match the column list; `rows` describes each one."""
+
+    def __init__(self, columns: list, rows: list, count: int):
+        super().__init__(f"{count} row(s) do not match the columns {', '.join(map(str, columns))}")
+        self.rows = rows
+        self.count = count
+
+
+def row_values(rows: list, columns: list) -> list:
+    """Values of write-tool rows in column order.
+
+    A dict row must have exactly the given columns and a list row exactly
+    that many values. A missing key is an error rather than NULL, since
+    writing NULL would overwrite the stored value on update or upsert.
+    """
+    expected = set(columns)
+    values, problems, count = [], [], 0
+    for index, row in enumerate(rows):
+        if isinstance(row, dict):
+            if row.keys() == expected:
+                values.append([row[c] for c in columns])
+                continue
+            missing = [c for c in columns if c not in row]
+            unexpected = [k for k in row if k not in expected]
+            problem = {"index": index, "missing": missing, "unexpected": unexpected}
+        elif isinstance(row, (list, tuple)) and len(row) == len(columns):
+            values.append(list(row))
+            continue
+        else:
+            problem = {"index": index, "error": f"expected {len(columns)} values"}
+        count += 1
+        if len(problems) < MAX_REPORTED_ROWS:
+            problems.append(problem)
+    if count:
+        raise RowShapeError(columns, problems, count)
+    return values
+
+
+def _arrow_payload(columns, rows) -> dict:
+    import pyarrow as pa
+
+    arrays = []
+    for i in range(len(columns)):
+        values = [row[i] for row in rows]
+        try:
+            # Arrow keeps Decimal, datetime and bytes as native typed columns
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # Mixed or unsupported types in one column: fall back to JSON text
+            arrays.append(pa.array([None if v is None else json.dumps(encode_value(v)) for v in values]))
+    table = pa.Table.from_arrays(arrays, names=[str(col) for col in columns])
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return {
+        "format": "arrow",
+        "encoding": "base64",
+        "row_count": len(rows),
+        "data": base64.b64encode(sink.getvalue().to_pybytes()).decode(),
+    }
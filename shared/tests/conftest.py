@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Shared modules use flat imports from the shared directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,49 @@
+import datetime
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "_tools", {})
+    monkeypatch.setattr(metrics, "MCP_METRICS", True)
+
+
+def record(result, str_errors=False):
+    metrics.begin()
+    metrics.end("tool", 0.001, result, str_errors=str_errors)
+    return metrics.snapshot()["tool"]
+
+
+@pytest.mark.parametrize("result, rows", [
+    ({"columns": ["a"], "rows": [[1], [2]], "row_count": 2}, 2),
+    ({"documents": [{"a": 1}], "count": 1, "next_token": None}, 1),
+    ([{"a": 1}, {"a": 2}, {"a": 3}], 3),
+    ({"collection": "c", "count": 4187}, 0),
+    (["orders", "users"], 0),
+    ("Inserted document with ID: 1", 0),
+])
+def test_rows_come_only_from_row_and_document_payloads(result, rows):
+    assert record(result)["rows"] == rows
+
+
+@pytest.mark.parametrize("result", [
+    {"collection": "c", "count": 3},
+    {"success": "Wrote 2 rows to t", "inserted": 2},
+    [{"_id": "6ad4f24ccc9e723854bba120", "at": datetime.datetime(2024, 1, 1)}],
+    "Matched 1, Modified 1",
+])
+def test_bytes_are_recorded_for_every_result(result):
+    assert record(result)["bytes"] > 0
+
+
+def test_bytes_match_the_compact_json_size():
+    assert record({"a": [1, 2]})["bytes"] == len('{"a":[1,2]}')
+
+
+def test_errors_are_counted_without_rows():
+    stats = record({"error": "boom", "row_count": 5})
+    assert (stats["errors"], stats["rows"]) == (1, 0)
+    assert record(" Error during find: boom", str_errors=True)["errors"] == 2
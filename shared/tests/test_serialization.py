@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+import serialization
+from serialization import ResponseBudget, RowShapeError, budget_of, fetch_within, row_values
+
+
+def fetcher(rows):
+    """A cursor.fetchmany stand-in that records the sizes it was asked for."""
+    rows = list(rows)
+    asked = []
+
+    def fetch(size):
+        asked.append(size)
+        chunk = rows[:size]
+        del rows[:size]
+        return chunk
+    return fetch, asked
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(serialization, "MCP_FETCH_CHUNK_ROWS", 4)
+
+
+def test_unlimited_budget_reads_everything():
+    fetch, asked = fetcher(range(10))
+    budget = ResponseBudget()
+    assert not budget.limited
+    assert fetch_within(fetch, budget) == list(range(10))
+    assert budget.exhausted is None
+    assert asked == [4, 4, 4]
+
+
+def test_row_limit_stops_reading():
+    fetch, asked = fetcher(range(100))
+    budget = ResponseBudget(max_rows=6)
+    assert fetch_within(fetch, budget) == list(range(6))
+    assert budget.exhausted == "max_rows"
+    assert budget.marker(100) == {"reason": "max_rows", "rows_returned": 6, "estimated_total_rows": 100}
+    assert asked == [4, 3]
+
+
+def test_exactly_full_is_not_truncated():
+    fetch, _ = fetcher(range(6))
+    budget = ResponseBudget(max_rows=6)
+    assert fetch_within(fetch, budget) == list(range(6))
+    assert budget.exhausted is None
+
+
+def test_byte_limit_keeps_whole_rows():
+    rows = [["x" * 10]] * 10
+    size = len(json.dumps(rows[0])) + 1
+    fetch, _ = fetcher(rows)
+    budget = ResponseBudget(max_bytes=3 * size + 1)
+    assert fetch_within(fetch, budget) == rows[:3]
+    assert budget.exhausted == "max_bytes"
+    assert budget.bytes == 3 * size
+
+
+def test_on_chunk_receives_rows_instead_of_the_result():
+    fetch, _ = fetcher(range(10))
+    chunks = []
+    assert fetch_within(fetch, ResponseBudget(max_rows=7), chunks.append) == []
+    assert chunks == [[0, 1, 2, 3], [4, 5, 6]]
+
+
+@pytest.mark.parametrize("args", [{"max_rows": "x"}, {"max_bytes": -1}])
+def test_budget_of_rejects_bad_limits(args):
+    with pytest.raises(ValueError):
+        budget_of(args)
+
+
+def test_budget_of_reads_limits():
+    budget = budget_of({"max_rows": "5", "max_bytes": 100})
+    assert (budget.max_rows, budget.max_bytes) == (5, 100)
+
+
+def test_row_values_orders_dict_and_list_rows():
+    rows = [{"id": 1, "name": "a"}, {"name": "b", "id": 2}, [3, "c"]]
+    assert row_values(rows, ["id", "name"]) == [[1, "a"], [2, "b"], [3, "c"]]
+
+
+def test_row_values_rejects_mismatched_keys():
+    rows = [{"id": 1, "name": "a"}, {"id": 2}, {"id": 3, "name": "c", "extra": 0}, [4]]
+    with pytest.raises(RowShapeError) as raised:
+        row_values(rows, ["id", "name"])
+    assert raised.value.count == 3
+    assert raised.value.rows == [
+        {"index": 1, "missing": ["name"], "unexpected": []},
+        {"index": 2, "missing": [], "unexpected": ["extra"]},
+        {"index": 3, "error": "expected 2 values"},
+    ]
+
+
+def test_row_values_caps_reported_rows(monkeypatch):
+    monkeypatch.setattr(serialization, "MAX_REPORTED_ROWS", 2)
+    with pytest.raises(RowShapeError) as raised:
+        row_values([{"a": 1}] * 5, ["b"])
+    assert (raised.value.count, len(raised.value.rows)) == (5, 2)